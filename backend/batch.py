@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def compute_batch(table, from_currencies, to_currencies, amounts):
+    """Convert a whole batch in one vectorised pass over the rate matrix.
+
+    Currency codes are resolved to matrix indices once per distinct code and
+    broadcast back to the items, so the Python-level work depends on the
+    number of currencies, not items. Raises UnsupportedPair for unknown codes.
+    Returns (rates, converted) as float64 arrays aligned with the input; a
+    converted amount that overflows float64 is inf.
+    """
+    rates = table.rates(from_currencies, to_currencies)
+    with np.errstate(over="ignore"):
+        converted = np.round(np.asarray(amounts, dtype=np.float64) * rates, 4)
+    return np.round(rates, 4), converted
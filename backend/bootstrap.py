@@ -0,0 +1,95 @@
+"""Background startup and cold-start timing.
+
+Bootstrap runs the startup steps that need MySQL (schema migrations,
+starting the history writer, warming the rate cache) after the app is
+already serving, retrying each step with backoff until it succeeds. The
+app reports ready only once every step is done, so a slow or unavailable
+database delays readiness instead of blocking the process from starting.
+"""
+import asyncio
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class Bootstrap:
+    """Runs named startup steps in order, each retried until it succeeds.
+
+    steps is a list of (name, fn); fn is a blocking callable and runs in a
+    worker thread.
+    """
+
+    def __init__(self, steps, retry_initial=1, retry_max=30, sleep=asyncio.sleep):
+        self.steps = list(steps)
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.sleep = sleep
+        self.done = []
+        self.attempts = 0
+        self.last_error = None
+
+    @property
+    def ready(self):
+        return len(self.done) == len(self.steps)
+
+    async def run(self):
+        for name, step in self.steps:
+            delay = self.retry_initial
+            while True:
+                self.attempts += 1
+                try:
+                    await asyncio.to_thread(step)
+                    break
+                except Exception as e:
+                    self.last_error = f"{name}: {e}"
+                    logger.warning("Startup step %s failed, retrying in %ss: %s", name, delay, e)
+                    await self.sleep(delay)
+                    delay = min(delay * 2, self.retry_max)
+            self.done.append(name)
+            logger.info("Startup step %s done", name)
+        self.last_error = None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "done": self.done,
+            "pending": [name for name, _ in self.steps if name not in self.done],
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+        }
+
+
+class ColdStart:
+    """Seconds from module import to each startup milestone (recorded once)."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.phases = {}
+
+    def mark(self, phase):
+        self.phases.setdefault(phase, self.clock() - self.started)
+
+    def stats(self):
+        return {phase: round(seconds, 4) for phase, seconds in self.phases.items()}
+
+
+class FirstRequestMiddleware:
+    """ASGI middleware marking when the first HTTP response has been sent."""
+
+    def __init__(self, app, cold_start):
+        self.app = app
+        self.cold_start = cold_start
+        self.seen = False
+
+    async def __call__(self, scope, receive, send):
+        if self.seen or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.seen = True
+            self.cold_start.mark("first_request")
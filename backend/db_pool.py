@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def pool_settings():
+    """QueuePool settings from the environment.
+
+    pool_recycle stays well below MySQL's default wait_timeout (8h) so idle
+    connections are replaced before the server drops them; pre-ping catches
+    the ones it dropped anyway.
+    """
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+
+class PoolMetrics:
+    """Counters for one connection pool, updated by the instrumented pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.pool = None
+
+    def record_wait(self, seconds, overflowed):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self, seconds):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def attach(self, engine):
+        """Instrument a (sync) engine created with one of the pools below."""
+        self.pool = engine.pool
+        self.pool.metrics = self
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        @event.listens_for(engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            self.invalidations += 1
+
+        @event.listens_for(engine, "engine_disposed")
+        def on_disposed(engine):
+            self.pool = engine.pool
+            self.pool.metrics = self
+
+    def snapshot(self):
+        pool = self.pool
+        return {
+            "size": pool.size() if pool else None,
+            "checked_out": pool.checkedout() if pool else None,
+            "checked_in": pool.checkedin() if pool else None,
+            "overflow": max(pool.overflow(), 0) if pool else None,
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class _InstrumentedPool:
+    """Times every checkout, including the wait for a free connection."""
+
+    metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        overflow_before = self._overflow
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        if self.metrics is not None:
+            overflowed = self._overflow > overflow_before and self._overflow > 0
+            self.metrics.record_wait(time.perf_counter() - start, overflowed)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,17 @@
+import os
+
+import requests
+
+
+# point at frankfurter_standin.py (or a self-hosted Frankfurter) to run offline
+FRANKFURTER_URL = os.getenv("FRANKFURTER_URL", "https://api.frankfurter.app").rstrip("/")
+
+# (connect, read) seconds; a range of 90 days is a large response
+RANGE_TIMEOUT = (2, 30)
+
+
+def fetch_range(start, end, base="EUR"):
+    """Fetch a Frankfurter time series: {"rates": {date: {currency: rate}}, ...}"""
+    response = requests.get(f"{FRANKFURTER_URL}/{start}..{end}", params={"from": base}, timeout=RANGE_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
@@ -0,0 +1,160 @@
+"""Frankfurter-compatible stand-in served from a rate snapshot.
+
+Answers the parts of the Frankfurter API this service uses, from a
+rate_snapshot file and without any network access:
+
+    /latest                 newest table in the snapshot
+    /2024-01-05             table in effect on that day
+    /2024-01-01..2024-01-31 time series (the end may be left open)
+
+with the usual from (or base), to (or symbols) and amount parameters.
+Rendered responses are kept in an LRU, so repeated calls are a dict lookup.
+Start the app with FRANKFURTER_URL pointing here to run fully offline:
+
+    python frankfurter_standin.py rates.fxsnap --port 8080
+    FRANKFURTER_URL=http://localhost:8080 uvicorn main:app
+"""
+import argparse
+import functools
+import json
+import logging
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from rate_snapshot import Snapshot
+
+
+logger = logging.getLogger(__name__)
+
+DAY = r"\d{4}-\d{2}-\d{2}"
+RANGE_PATH = re.compile(rf"^({DAY})\.\.({DAY})?$")
+DAY_PATH = re.compile(rf"^{DAY}$")
+RESPONSE_CACHE_SIZE = 4096
+
+
+class NotFound(Exception):
+    pass
+
+
+class Standin:
+    """Turns request targets into (status, JSON body) from one snapshot."""
+
+    def __init__(self, snapshot, cache_size=RESPONSE_CACHE_SIZE):
+        self.snapshot = snapshot
+        self.respond = functools.lru_cache(cache_size)(self._respond)
+
+    def _respond(self, target):
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            body = self.render(url.path.strip("/"), params)
+        except NotFound as e:
+            return 404, json.dumps({"message": str(e)}).encode()
+        except ValueError as e:
+            return 422, json.dumps({"message": str(e)}).encode()
+        return 200, json.dumps(body, separators=(",", ":")).encode()
+
+    def render(self, path, params):
+        snapshot = self.snapshot
+        base = (params.get("from") or params.get("base") or snapshot.base).upper()
+        symbols = params.get("to") or params.get("symbols")
+        symbols = [s.strip().upper() for s in symbols.split(",") if s.strip()] if symbols else None
+        amount = float(params.get("amount", 1))
+
+        if path == "latest" or DAY_PATH.match(path):
+            index = len(snapshot) - 1 if path == "latest" else snapshot.index_on(path)
+            if index is None or index < 0:
+                raise NotFound("not found")
+            return {"amount": amount, "base": base, "date": snapshot.day(index),
+                    "rates": self.quote(index, base, symbols, amount)}
+        if match := RANGE_PATH.match(path):
+            rows = snapshot.index_range(match.group(1), match.group(2))
+            if not rows:
+                raise NotFound("not found")
+            return {
+                "amount": amount, "base": base,
+                "start_date": snapshot.day(rows[0]), "end_date": snapshot.day(rows[-1]),
+                "rates": {snapshot.day(i): self.quote(i, base, symbols, amount) for i in rows},
+            }
+        raise NotFound("not found")
+
+    def quote(self, index, base, symbols, amount):
+        table = self.snapshot.table(index)
+        table[self.snapshot.base] = 1.0
+        if base not in table:
+            raise NotFound("not found")
+        unknown = [s for s in symbols or () if s not in self.snapshot.column and s != self.snapshot.base]
+        if unknown:
+            raise NotFound("not found")
+        wanted = symbols or sorted(table)
+        rate_base = table[base]
+        return {s: round(amount * table[s] / rate_base, 6) for s in wanted if s != base and s in table}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # keep-alive: the app's pooled clients reuse connections
+    protocol_version = "HTTP/1.1"
+    standin = None
+
+    def do_GET(self):
+        status, payload = self.standin.respond(self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+
+def make_server(snapshot, host="127.0.0.1", port=0):
+    """ThreadingHTTPServer serving snapshot; port 0 picks a free port."""
+    handler = type("StandinHandler", (Handler,), {"standin": Standin(snapshot)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class StandinServer:
+    """Runs the stand-in in a background thread (tests, benchmarks)."""
+
+    def __init__(self, path):
+        self.snapshot = Snapshot(path)
+        self.server = make_server(self.snapshot)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        self.snapshot.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a rate snapshot as a Frankfurter-compatible API")
+    parser.add_argument("snapshot")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    snapshot = Snapshot(args.snapshot)
+    server = make_server(snapshot, args.host, args.port)
+    logger.info("Serving %s on %s:%d", snapshot.info(), args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# errors a retry cannot fix: the database rejects a row's values
+PERMANENT_ERRORS = (DataError, IntegrityError)
+
+
+class HistoryWriter:
+    """Write-behind buffer for conversion_history rows.
+
+    Rows are queued in memory and written by a background thread through
+    flush(rows), one multi-row insert per batch. A batch is flushed when it
+    reaches batch_size rows or flush_interval seconds after its first row,
+    whichever comes first. The queue is bounded: submit() blocks for up to
+    put_timeout seconds when it is full and returns False if there is still
+    no room, so the caller can write the row itself.
+
+    A failed flush is retried with exponential backoff (retry_initial up to
+    retry_max seconds, at most max_retries times), so a transient error or
+    a short outage holds the batch instead of losing it; new rows queue up
+    behind it until the queue is full. A permanent error (one of permanent,
+    the database refusing a value) is not retried: the batch is bisected
+    until the rows it refuses are isolated, and only those are dropped.
+    Dropped rows are counted in failed and logged; so are rows that still
+    fail after the retries or after stop().
+    """
+
+    def __init__(self, flush, batch_size=500, flush_interval=0.2, max_queue=10000, put_timeout=0.05,
+                 retry_initial=0.1, retry_max=5, max_retries=20, permanent=PERMANENT_ERRORS):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.max_retries = max_retries
+        self.permanent = permanent
+        self.running = False
+        self.flushed = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        """Stop accepting rows, flush everything still queued and join the thread."""
+        if not self.running:
+            return
+        self.running = False
+        self._stopping.set()  # cut a retry backoff short
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, row):
+        """Queue a row, waiting briefly for room. Returns False if not queued."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            return False
+        return True
+
+    def offer(self, row):
+        """Non-blocking submit() for the event loop."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            return False
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+        # drain rows that raced with stop()
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for i in range(0, len(leftover), self.batch_size):
+            self._write(leftover[i:i + self.batch_size])
+
+    def _write(self, batch):
+        delay = self.retry_initial
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.flush(batch)
+            except self.permanent as e:
+                self._isolate(batch, e)
+                return
+            except Exception as e:
+                if self._stopping.is_set() or attempt == self.max_retries:
+                    self._drop(batch, e)
+                    return
+                self.retries += 1
+                logger.warning("History flush of %d rows failed, retrying in %ss: %s", len(batch), delay, e)
+                self._stopping.wait(delay)
+                delay = min(delay * 2, self.retry_max)
+            else:
+                self.flushed += len(batch)
+                self.batches += 1
+                return
+
+    def _isolate(self, batch, error):
+        """Write the halves of a batch the database refused, down to the rows it refuses."""
+        if len(batch) == 1:
+            self.failed += 1
+            logger.error("History row refused by the database, dropped: %s", error, extra={"row": batch[0]})
+            return
+        middle = len(batch) // 2
+        self._write(batch[:middle])
+        self._write(batch[middle:])
+
+    def _drop(self, batch, error):
+        self.failed += len(batch)
+        logger.error("History flush failed, dropped %d rows: %s", len(batch), error)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
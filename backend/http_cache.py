@@ -0,0 +1,43 @@
+"""Conditional GET support: ETags, If-None-Match and Cache-Control.
+
+Handlers derive an ETag from whatever versions their response (the rate
+publication date, the range of history ids, ...) before doing the expensive
+part, and answer 304 Not Modified when the client already has that version.
+"""
+import hashlib
+
+from fastapi import Response
+
+
+def etag(*parts):
+    """Strong ETag for the given version parts."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def matches(if_none_match, tag):
+    """If-None-Match check; uses the weak comparison RFC 9110 asks for."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return tag.removeprefix("W/") in candidates
+
+
+def not_modified(if_none_match, tag, cache_control):
+    """A 304 response if the client's copy is current, otherwise None."""
+    if matches(if_none_match, tag):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": cache_control})
+    return None
+
+
+def set_headers(response, tag, cache_control):
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def max_age(seconds, shared=True):
+    scope = "public" if shared else "private"
+    return f"{scope}, max-age={max(int(seconds), 0)}"
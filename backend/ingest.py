@@ -0,0 +1,362 @@
+"""Bulk import of conversion records into conversion_history.
+
+Reads CSV (with a header row) or NDJSON records with from_currency (or
+from), to_currency (or to), amount, rate, date and optionally converted
+(amount * rate when missing); other fields are ignored, so /history/export
+output can be loaded back. Records are validated chunk by chunk; invalid
+ones are counted and reported, not loaded. Each chunk is loaded with one
+multi-row insert (or MySQL LOAD DATA LOCAL INFILE), added to the
+conversion_stats summary, and the job's checkpoint is advanced in the same
+transaction. Running a job again resumes after its last committed chunk,
+without duplicating rows.
+
+    python ingest.py load records.csv [--job partner-2024-01] [--method load-data]
+    python ingest.py load - --format ndjson < records.ndjson
+    python ingest.py status partner-2024-01
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+import migrations
+import stats
+from serialise import loads
+
+
+logger = logging.getLogger(__name__)
+
+LOAD_COLUMNS = ("from_currency", "to_currency", "amount", "rate", "converted", "date")
+
+CHUNK_ROWS = 10000
+# rejected records are counted in full, but only this many are described
+MAX_REPORTED_ERRORS = 100
+
+CURRENCY = re.compile(r"[A-Z]{3}")
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+# field names of the conversion response, accepted for from_currency / to_currency
+ALIASES = {"from": "from_currency", "to": "to_currency"}
+REVERSE_ALIASES = {name: alias for alias, name in ALIASES.items()}
+FORMATS = ("csv", "ndjson")
+METHODS = ("insert", "load-data")
+
+
+def create_checkpoint_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            job VARCHAR(255) NOT NULL PRIMARY KEY,
+            records BIGINT NOT NULL,
+            inserted BIGINT NOT NULL,
+            rejected BIGINT NOT NULL,
+            finished SMALLINT NOT NULL,
+            updated_at VARCHAR(32) NOT NULL
+        )
+    """))
+
+
+def checkpoint_statement(conn):
+    if conn.dialect.name == "mysql":
+        return text("""
+            INSERT INTO ingest_checkpoints (job, records, inserted, rejected, finished, updated_at)
+            VALUES (:job, :records, :inserted, :rejected, :finished, :updated_at)
+            ON DUPLICATE KEY UPDATE records = VALUES(records), inserted = VALUES(inserted),
+                rejected = VALUES(rejected), finished = VALUES(finished), updated_at = VALUES(updated_at)
+        """)
+    return text("""
+        INSERT INTO ingest_checkpoints (job, records, inserted, rejected, finished, updated_at)
+        VALUES (:job, :records, :inserted, :rejected, :finished, :updated_at)
+        ON CONFLICT (job) DO UPDATE SET records = excluded.records, inserted = excluded.inserted,
+            rejected = excluded.rejected, finished = excluded.finished, updated_at = excluded.updated_at
+    """)
+
+
+def save_checkpoint(conn, job, progress, finished=False):
+    conn.execute(checkpoint_statement(conn), {
+        "job": job,
+        "records": progress["records"],
+        "inserted": progress["inserted"],
+        "rejected": progress["rejected"],
+        "finished": int(finished),
+        "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+
+
+def checkpoint(conn, job):
+    """The job's committed progress, or None if it never ran."""
+    row = conn.execute(text("SELECT * FROM ingest_checkpoints WHERE job = :job"), {"job": job}).mappings().first()
+    return dict(row, finished=bool(row["finished"])) if row is not None else None
+
+
+def delete_checkpoint(conn, job):
+    conn.execute(text("DELETE FROM ingest_checkpoints WHERE job = :job"), {"job": job})
+
+
+def read_records(stream, fmt):
+    """(header, records): CSV rows as lists after the header row, NDJSON as raw lines."""
+    if fmt == "csv":
+        reader = csv.reader(stream)
+        header = [ALIASES.get(name.strip(), name.strip()) for name in next(reader, [])]
+        return header, reader
+    return None, (line for line in stream if line.strip())
+
+
+def as_dicts(records, header):
+    """Chunk records as dicts (NDJSON parsed, CSV keyed by header); unusable ones become error strings."""
+    if header is not None:
+        return [dict(zip(header, row)) if len(row) == len(header) else "wrong number of fields" for row in records]
+    dicts = []
+    for line in records:
+        try:
+            record = loads(line)
+        except ValueError:
+            dicts.append("invalid JSON")
+            continue
+        dicts.append(record if isinstance(record, dict) else "not a JSON object")
+    return dicts
+
+
+def as_columns(records, header):
+    """{field: column} for a chunk of well-formed records; raises ValueError otherwise."""
+    if header is not None:
+        width = len(header)
+        if any(len(row) != width for row in records):
+            raise ValueError("wrong number of fields")
+        return dict(zip(header, zip(*records)))
+    dicts = [loads(line) for line in records]
+    if not all(isinstance(record, dict) for record in dicts):
+        raise ValueError("not a JSON object")
+    return dicts_to_columns(dicts)
+
+
+def dicts_to_columns(dicts):
+    columns = {name: [record.get(name) for record in dicts] for name in LOAD_COLUMNS}
+    for name, alias in REVERSE_ALIASES.items():
+        columns[name] = [value or record.get(alias) for value, record in zip(columns[name], dicts)]
+    return columns
+
+
+def normalise(values, check):
+    """values mapped through check, which runs once per distinct value; raises on the first invalid one."""
+    mapping = {value: check(value) for value in set(values)}
+    return list(map(mapping.__getitem__, values))
+
+
+def currency_code(value):
+    code = str(value).strip().upper() if value is not None else ""
+    if not CURRENCY.fullmatch(code):
+        raise ValueError("currencies must be 3-letter codes")
+    return code
+
+
+def day(value):
+    text_value = str(value)[:10] if value is not None else ""
+    if not DATE.fullmatch(text_value):
+        raise ValueError("date must be YYYY-MM-DD")
+    date.fromisoformat(text_value)
+    return text_value
+
+
+def numbers(values):
+    return np.array([None if value == "" else value for value in values], dtype=np.float64)
+
+
+def check_range(values, column):
+    """Values must be positive and fit the conversion_history DECIMAL column (no inf; NaN fails both)."""
+    limit = migrations.decimal_limit(column)
+    if not ((values > 0) & (values < limit)).all():
+        raise ValueError(f"{column} must be a positive number below {limit:.0e}")
+
+
+def validate_columns(columns, n):
+    """Validated (from, to, amount, rate, converted, date) columns; raises on any invalid record."""
+    missing = [None] * n
+
+    def column(name):
+        values = columns.get(name)
+        return missing if values is None else values
+
+    from_currencies = normalise(column("from_currency"), currency_code)
+    to_currencies = normalise(column("to_currency"), currency_code)
+    days = normalise(column("date"), day)
+    amounts = numbers(column("amount"))
+    rates = numbers(column("rate"))
+    check_range(amounts, "amount")
+    check_range(rates, "rate")
+    converted = numbers(column("converted"))
+    unset = np.isnan(converted)
+    if unset.any():
+        converted[unset] = np.round(amounts[unset] * rates[unset], 4)
+    check_range(converted, "converted")
+    return from_currencies, to_currencies, amounts, rates, converted, days
+
+
+def validate_chunk(records, header, first):
+    """(columns, errors) for a chunk; errors are (record number, reason), numbered from first.
+
+    The whole chunk is validated column by column first; only a chunk with
+    invalid records is gone through record by record to find them.
+    """
+    try:
+        return validate_columns(as_columns(records, header), len(records)), []
+    except (ValueError, TypeError):
+        pass
+    valid, errors = [], []
+    for number, record in enumerate(as_dicts(records, header), first):
+        if isinstance(record, str):
+            errors.append((number, record))
+            continue
+        try:
+            validate_columns(dicts_to_columns([record]), 1)
+        except (ValueError, TypeError) as e:
+            errors.append((number, str(e)))
+            continue
+        valid.append(record)
+    if not valid:
+        return None, errors
+    return validate_columns(dicts_to_columns(valid), len(valid)), errors
+
+
+def insert_rows(conn, columns):
+    """Multi-row insert through the driver's executemany (pymysql folds it into INSERT ... VALUES (...), (...))."""
+    marker = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    from_currencies, to_currencies, amounts, rates, converted, days = columns
+    conn.exec_driver_sql(
+        f"INSERT INTO conversion_history ({', '.join(LOAD_COLUMNS)}) VALUES ({', '.join([marker] * len(LOAD_COLUMNS))})",
+        list(zip(from_currencies, to_currencies, amounts.tolist(), rates.tolist(), converted.tolist(), days)),
+    )
+
+
+def load_data_rows(conn, columns):
+    """MySQL LOAD DATA LOCAL INFILE from a temporary TSV file (needs local_infile on both ends)."""
+    from_currencies, to_currencies, amounts, rates, converted, days = columns
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, newline="") as f:
+        csv.writer(f, delimiter="\t", lineterminator="\n").writerows(
+            zip(from_currencies, to_currencies, amounts.tolist(), rates.tolist(), converted.tolist(), days))
+    try:
+        conn.exec_driver_sql(
+            f"LOAD DATA LOCAL INFILE '{f.name}' INTO TABLE conversion_history "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(LOAD_COLUMNS)})"
+        )
+    finally:
+        os.unlink(f.name)
+
+
+def ingest(engine, stream, fmt, job, method="insert", chunk_rows=CHUNK_ROWS, progress=None):
+    """Load every record of stream, resuming after the job's last committed chunk.
+
+    progress, if given, is called with the running summary after each chunk.
+    Returns the summary: records read (including those of earlier runs),
+    rows inserted, records rejected and the first rejection reasons.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if method not in METHODS:
+        raise ValueError(f"Unsupported method: {method}")
+    with engine.begin() as conn:
+        create_checkpoint_table(conn)
+        stats.create_stats_table(conn)
+        previous = checkpoint(conn, job)
+    load = insert_rows
+    if method == "load-data":
+        if engine.dialect.name == "mysql":
+            load = load_data_rows
+        else:
+            logger.info("LOAD DATA needs MySQL; using multi-row inserts on %s", engine.dialect.name)
+
+    summary = {"job": job, "records": 0, "inserted": 0, "rejected": 0, "errors": [], "resumed_from": 0}
+    if previous is not None:
+        summary.update(records=previous["records"], inserted=previous["inserted"], rejected=previous["rejected"],
+                       resumed_from=previous["records"])
+    started = time.perf_counter()
+    header, records = read_records(stream, fmt)
+    records = itertools.islice(records, summary["records"], None)
+    while chunk := list(itertools.islice(records, chunk_rows)):
+        columns, errors = validate_chunk(chunk, header, summary["records"] + 1)
+        inserted = len(columns[0]) if columns is not None else 0
+        with engine.begin() as conn:
+            if columns is not None:
+                load(conn, columns)
+                stats.record_deltas(conn, stats.aggregate_columns(
+                    columns[5], columns[0], columns[1], columns[2], columns[3], columns[4]))
+            summary["records"] += len(chunk)
+            summary["inserted"] += inserted
+            summary["rejected"] += len(errors)
+            save_checkpoint(conn, job, summary)
+        room = MAX_REPORTED_ERRORS - len(summary["errors"])
+        summary["errors"].extend({"record": number, "error": reason} for number, reason in errors[:room])
+        if progress is not None:
+            progress(with_rate(summary, started))
+    with engine.begin() as conn:
+        save_checkpoint(conn, job, summary, finished=True)
+    return with_rate(summary, started)
+
+
+def with_rate(summary, started):
+    seconds = time.perf_counter() - started
+    loaded = summary["records"] - summary["resumed_from"]
+    return dict(summary, seconds=round(seconds, 3), records_per_second=round(loaded / seconds) if seconds else None)
+
+
+def text_stream(binary):
+    return io.TextIOWrapper(binary, encoding="utf-8", newline="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import conversion records")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load_cmd = sub.add_parser("load", help="import a CSV or NDJSON file ('-' for stdin)")
+    load_cmd.add_argument("path")
+    load_cmd.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    load_cmd.add_argument("--job", help="checkpoint name; default: the file name")
+    load_cmd.add_argument("--method", choices=METHODS, default="insert")
+    load_cmd.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    load_cmd.add_argument("--restart", action="store_true", help="forget the job's checkpoint and start over")
+    status_cmd = sub.add_parser("status", help="show a job's checkpoint")
+    status_cmd.add_argument("job")
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL", "mysql+pymysql://fxuser:fxpass@db:3306/fxdb")
+    connect_args = {"local_infile": True} if getattr(args, "method", None) == "load-data" and url.startswith("mysql") else {}
+    engine = create_engine(url, connect_args=connect_args)
+
+    if args.command == "status":
+        with engine.begin() as conn:
+            create_checkpoint_table(conn)
+            print(checkpoint(conn, args.job))
+        return
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    job = args.job or (os.path.basename(args.path) if args.path != "-" else None)
+    if job is None:
+        parser.error("--job is required when reading stdin")
+    if args.restart:
+        with engine.begin() as conn:
+            create_checkpoint_table(conn)
+            delete_checkpoint(conn, job)
+
+    def report(summary):
+        print(f"\r{summary['records']} records, {summary['inserted']} inserted, {summary['rejected']} rejected, "
+              f"{summary['records_per_second']} records/s", end="", file=sys.stderr, flush=True)
+
+    stream = text_stream(sys.stdin.buffer) if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+    with stream:
+        summary = ingest(engine, stream, fmt, job, args.method, args.chunk_rows, progress=report)
+    print(file=sys.stderr)
+    for error in summary["errors"]:
+        print(f"record {error['record']}: {error['error']}", file=sys.stderr)
+    print(json.dumps({k: v for k, v in summary.items() if k != "errors"}))
+
+
+if __name__ == "__main__":
+    main()
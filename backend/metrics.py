@@ -0,0 +1,229 @@
+"""Minimal Prometheus-style metrics without a client library.
+
+Counters and histograms are sharded per thread: each thread only ever
+writes to its own shard, so recording takes no lock (the registry lock is
+taken once per thread, when its shard is created). When a thread ends its
+shard is folded into a retired total, so short-lived worker threads do not
+pile up shards. A scrape sums the live shards and the retired total. Render the registry with render() in the Prometheus text format.
+"""
+import bisect
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+# seconds; tuned for an API whose hot path should stay under ~100 ms
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ThreadMarker:
+    """Only referenced from a thread-local, so it is collected when its thread ends."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _Sharded:
+    """Per-thread storage: {label values: value} dicts, one per thread."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._local.marker = marker = _ThreadMarker()
+            weakref.finalize(marker, self._retire, shard).atexit = False
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard):
+        # the owning thread has ended, nothing writes to shard any more;
+        # build a new total so a concurrent scrape keeps a consistent one
+        with self._lock:
+            retired = {}
+            self._merge(retired, self._retired)
+            self._merge(retired, shard)
+            self._retired = retired
+            self._shards = [s for s in self._shards if s is not shard]
+
+    def _collect_shards(self):
+        with self._lock:
+            shards = list(self._shards)
+            retired = self._retired
+        # copy each shard first, the owning thread may add keys meanwhile
+        return [dict(shard) for shard in shards] + [retired]
+
+    def values(self):
+        totals = {}
+        for shard in self._collect_shards():
+            self._merge(totals, shard)
+        return totals
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    @staticmethod
+    def _merge(totals, shard):
+        for labels, value in shard.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Histogram(_Sharded):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # per-bucket counts, then sum, then count
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    @staticmethod
+    def _merge(totals, shard):
+        for labels, state in shard.items():
+            total = totals.setdefault(labels, [0] * len(state))
+            for i, value in enumerate(list(state)):
+                total[i] += value
+
+    def render(self):
+        lines = []
+        for labels, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = (("le", _format_value(bound) if bound == float("inf") else repr(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read at scrape time: fn() returns {label values tuple: value}.
+
+    Also used with type="counter" to export totals another component
+    already keeps (cache hits, pool checkouts).
+    """
+
+    def __init__(self, name, help, labelnames, fn, type="gauge"):
+        self.type = type
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(self.fn().items()) if value is not None]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, labelnames, fn, type="gauge"):
+        return self.register(Gauge(name, help, labelnames, fn, type))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.render()
+            except Exception:
+                samples = []
+                logger.exception("Metric %s failed to render", metric.name)
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template."""
+
+    def __init__(self, app, histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # route templates keep label cardinality bounded (no raw paths)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.histogram.observe(time.perf_counter() - start, scope["method"], path, str(status))
@@ -0,0 +1,314 @@
+"""Versioned schema migrations for conversion_history.
+
+Each migration runs once; applied versions are recorded in
+schema_migrations, so every instance can call migrate() at startup.
+
+Version 2 replaces the original FLOAT/VARCHAR table with a compact typed
+one (CHAR(3) currencies, DECIMAL money, DATE, insert timestamp). On MySQL
+the table can be range-partitioned by month of created_at, so old months
+are dropped or archived with a metadata-only DROP PARTITION instead of a
+long DELETE.
+
+    python migrations.py migrate [--partitioned]
+    python migrations.py status
+    python migrations.py partition             # partition an existing table
+    python migrations.py add-partitions [--ahead 3]
+    python migrations.py drop-partitions --before 2024-01-01
+"""
+import argparse
+import os
+from datetime import date
+
+from sqlalchemy import create_engine, text
+
+
+# Composite indexes backing the /history filters. Each one ends with id, so a
+# page filtered by equality on its leading columns (a pair, either currency
+# alone, a single day) is a range scan in id order without a filesort. A
+# date range matches several (date, id) runs that are not in id order
+# together, so those pages (alone or combined with a currency) sort the
+# matching rows, once per page.
+HISTORY_INDEXES = {
+    "idx_history_pair": "from_currency, to_currency, id",
+    "idx_history_from": "from_currency, id",
+    "idx_history_to": "to_currency, id",
+    "idx_history_date": "date, id",
+}
+
+# DECIMAL(precision, scale) of the value columns of the typed table (version
+# 2); values are range-checked against these before they are inserted
+HISTORY_DECIMALS = {"amount": (24, 6), "rate": (18, 6), "converted": (24, 6)}
+
+# monthly partitions created ahead of time; later rows land in p_future
+PARTITIONS_AHEAD = 3
+
+HISTORY_COLUMNS = "id, from_currency, to_currency, amount, rate, converted, date, created_at"
+
+
+def decimal_limit(column):
+    """Smallest magnitude the conversion_history column can no longer store."""
+    precision, scale = HISTORY_DECIMALS[column]
+    return 10.0 ** (precision - scale)
+
+
+def create_migrations_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def applied_versions(conn):
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def ensure_history_indexes(conn, table="conversion_history"):
+    if conn.dialect.name != "mysql":
+        for name, columns in HISTORY_INDEXES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        return
+    # MySQL has no CREATE INDEX IF NOT EXISTS, so look up what is already there
+    existing = set(conn.execute(text("""
+        SELECT DISTINCT index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = :table
+    """), {"table": table}).scalars())
+    for name, columns in HISTORY_INDEXES.items():
+        if name not in existing:
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+
+
+def legacy_history(conn, partitioned=False):
+    """The original table, as deployments before migrations created it."""
+    id_column = "id INT AUTO_INCREMENT PRIMARY KEY" if conn.dialect.name == "mysql" else "id INTEGER PRIMARY KEY AUTOINCREMENT"
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS conversion_history (
+            {id_column},
+            from_currency VARCHAR(3),
+            to_currency VARCHAR(3),
+            amount FLOAT,
+            rate FLOAT,
+            converted FLOAT,
+            date VARCHAR(20)
+        )
+    """))
+    ensure_history_indexes(conn)
+
+
+def typed_history(conn, partitioned=False):
+    """Copy conversion_history into the typed layout and swap the tables."""
+    mysql = conn.dialect.name == "mysql"
+    conn.execute(text("DROP TABLE IF EXISTS conversion_history_new"))
+    if mysql:
+        # the partitioning column has to be part of every unique key
+        indexes = "".join(f",\n                INDEX {name} ({columns})" for name, columns in HISTORY_INDEXES.items())
+        clause = ""
+        if partitioned:
+            first = conn.execute(text("SELECT MIN(date) FROM conversion_history")).scalar()
+            clause = partition_clause(month_range(month_start(first) if first else this_month(), PARTITIONS_AHEAD))
+        conn.execute(text(f"""
+            CREATE TABLE conversion_history_new (
+                id BIGINT NOT NULL AUTO_INCREMENT,
+                from_currency CHAR(3),
+                to_currency CHAR(3),
+                amount DECIMAL(24, 6),
+                rate DECIMAL(18, 6),
+                converted DECIMAL(24, 6),
+                date DATE,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at){indexes}
+            ) {clause}
+        """))
+        created_at = "COALESCE(CAST(date AS DATETIME), CURRENT_TIMESTAMP)"
+    else:
+        conn.execute(text("""
+            CREATE TABLE conversion_history_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_currency CHAR(3),
+                to_currency CHAR(3),
+                amount DECIMAL(24, 6),
+                rate DECIMAL(18, 6),
+                converted DECIMAL(24, 6),
+                date DATE,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        created_at = "COALESCE(datetime(date), CURRENT_TIMESTAMP)"
+
+    # rows written before this migration have no timestamp; their rate date is the closest estimate
+    conn.execute(text(f"""
+        INSERT INTO conversion_history_new ({HISTORY_COLUMNS})
+        SELECT id, from_currency, to_currency, amount, rate, converted, date, {created_at}
+        FROM conversion_history
+    """))
+    if mysql:
+        conn.execute(text("RENAME TABLE conversion_history TO conversion_history_legacy, "
+                          "conversion_history_new TO conversion_history"))
+        conn.execute(text("DROP TABLE conversion_history_legacy"))
+    else:
+        conn.execute(text("DROP TABLE conversion_history"))
+        conn.execute(text("ALTER TABLE conversion_history_new RENAME TO conversion_history"))
+        ensure_history_indexes(conn)
+
+
+def history_indexes(conn, partitioned=False):
+    """Indexes added to HISTORY_INDEXES after the table was created."""
+    ensure_history_indexes(conn)
+
+
+MIGRATIONS = [
+    (1, "legacy conversion_history", legacy_history),
+    (2, "typed conversion_history", typed_history),
+    (3, "conversion_history from_currency index", history_indexes),
+]
+
+
+def migrate(engine, partitioned=False):
+    """Apply pending migrations in order. Returns the versions applied.
+
+    partitioned only matters when version 2 runs; an existing table is
+    partitioned with partition_history().
+    """
+    applied = []
+    with engine.begin() as conn:
+        mysql = conn.dialect.name == "mysql"
+        if mysql:
+            # several workers may start at once; only one of them migrates
+            conn.execute(text("SELECT GET_LOCK('fx_schema_migrations', 60)"))
+        try:
+            create_migrations_table(conn)
+            done = applied_versions(conn)
+            for version, name, apply in MIGRATIONS:
+                if version in done:
+                    continue
+                apply(conn, partitioned=partitioned)
+                conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                             {"version": version, "name": name})
+                applied.append(version)
+            if partitions(conn):
+                add_partitions(conn)
+        finally:
+            if mysql:
+                conn.execute(text("SELECT RELEASE_LOCK('fx_schema_migrations')"))
+    return applied
+
+
+# --- MONTHLY PARTITIONS (MySQL only) ---
+
+def month_start(value):
+    value = date.fromisoformat(str(value)[:10])
+    return value.replace(day=1)
+
+
+def this_month():
+    return date.today().replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+def month_range(first, ahead):
+    """Months from first up to and including `ahead` months past the current one."""
+    last = this_month()
+    for _ in range(ahead):
+        last = next_month(last)
+    months, month = [], first
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_definitions(months):
+    return [f"PARTITION {partition_name(m)} VALUES LESS THAN ('{next_month(m)}')" for m in months]
+
+
+def partition_clause(months):
+    definitions = partition_definitions(months) + ["PARTITION p_future VALUES LESS THAN (MAXVALUE)"]
+    return "PARTITION BY RANGE COLUMNS(created_at) (\n    " + ",\n    ".join(definitions) + "\n)"
+
+
+def partitions(conn):
+    """Monthly partitions of conversion_history as [(name, first day of month)], oldest first."""
+    if conn.dialect.name != "mysql":
+        return []
+    names = conn.execute(text("""
+        SELECT partition_name FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = 'conversion_history' AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """)).scalars()
+    return [(name, date(int(name[1:5]), int(name[5:7]), 1)) for name in names if name != "p_future"]
+
+
+def partition_history(conn, ahead=PARTITIONS_AHEAD):
+    """Partition an existing (unpartitioned) conversion_history by month. Rebuilds the table."""
+    first = conn.execute(text("SELECT MIN(created_at) FROM conversion_history")).scalar()
+    months = month_range(month_start(first) if first else this_month(), ahead)
+    conn.execute(text(f"ALTER TABLE conversion_history {partition_clause(months)}"))
+    return [partition_name(m) for m in months]
+
+
+def add_partitions(conn, ahead=PARTITIONS_AHEAD):
+    """Split the upcoming months out of p_future. Returns the partitions added."""
+    existing = partitions(conn)
+    if not existing:
+        return []
+    months = month_range(next_month(existing[-1][1]), ahead)
+    if not months:
+        return []
+    definitions = partition_definitions(months) + ["PARTITION p_future VALUES LESS THAN (MAXVALUE)"]
+    conn.execute(text(f"ALTER TABLE conversion_history REORGANIZE PARTITION p_future INTO ({', '.join(definitions)})"))
+    return [partition_name(m) for m in months]
+
+
+def drop_partitions(conn, before):
+    """Drop the monthly partitions that end on or before `before`. Returns their names."""
+    cutoff = date.fromisoformat(str(before))
+    names = [name for name, month in partitions(conn) if next_month(month) <= cutoff]
+    if names:
+        conn.execute(text(f"ALTER TABLE conversion_history DROP PARTITION {', '.join(names)}"))
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the conversion_history schema")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = sub.add_parser("migrate")
+    migrate_cmd.add_argument("--partitioned", action="store_true", help="partition the new table by month (MySQL)")
+    sub.add_parser("status")
+    sub.add_parser("partition")
+    add_cmd = sub.add_parser("add-partitions")
+    add_cmd.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD)
+    drop_cmd = sub.add_parser("drop-partitions")
+    drop_cmd.add_argument("--before", required=True, help="YYYY-MM-DD; whole months before it are dropped")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", "mysql+pymysql://fxuser:fxpass@db:3306/fxdb"))
+    if args.command == "migrate":
+        print(f"Applied migrations: {migrate(engine, partitioned=args.partitioned) or 'none'}")
+        return
+    with engine.begin() as conn:
+        if args.command == "status":
+            create_migrations_table(conn)
+            done = applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:>4}  {'applied' if version in done else 'pending':8} {name}")
+            for name, month in partitions(conn):
+                print(f"      partition {name} ({month:%Y-%m})")
+        elif args.command == "partition":
+            print(f"Partitions: {partition_history(conn)}")
+        elif args.command == "add-partitions":
+            print(f"Added partitions: {add_partitions(conn, args.ahead)}")
+        else:
+            print(f"Dropped partitions: {drop_partitions(conn, args.before)}")
+
+
+if __name__ == "__main__":
+    main()
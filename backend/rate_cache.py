@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+from rate_engine import RateTable
+from single_flight import SingleFlight
+
+
+# ECB publishes reference rates around 16:00 CET on TARGET business days.
+# We expire a table at PUBLISH_HOUR_UTC on the next business day after its
+# publication date, which is safely after the new rates appear in both
+# winter (15:00 UTC) and summer (14:00 UTC).
+PUBLISH_HOUR_UTC = 16
+
+# Floor on how long a freshly fetched table is kept. Protects the upstream
+# when the expected publication has passed but new rates are not out yet
+# (late publication, TARGET holidays).
+MIN_TTL_SECONDS = 300
+
+# After a failed upstream fetch the last good table is served as stale and
+# the next fetch attempt waits this long, so an outage is not hammered by
+# every request.
+STALE_RETRY_SECONDS = 30
+
+# Bases kept in process; the least recently used one is evicted beyond this
+MAX_ENTRIES = 32
+
+
+def next_publication(rate_date, publish_hour_utc=PUBLISH_HOUR_UTC):
+    """Return the UTC timestamp of the first publication after rate_date."""
+    day = date.fromisoformat(rate_date) + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    publish_at = datetime(day.year, day.month, day.day, publish_hour_utc, tzinfo=timezone.utc)
+    return publish_at.timestamp()
+
+
+class RateCache:
+    """In-process LRU cache of whole rate tables, keyed by base currency.
+
+    fetcher(base) must return a Frankfurter-style payload:
+    {"base": "EUR", "date": "2024-01-02", "rates": {"USD": 1.09, ...}}
+    async_fetcher is the coroutine equivalent used by aget(). Either may be
+    a shared tier (shared_cache.SharedRates) in front of the upstream.
+
+    version, if given, returns the current version of the source the
+    tables come from (rate_segment.RateSegment); an entry stored under an
+    older version is treated as expired. A payload may carry a prebuilt
+    "table" and its "version"; one fetched from elsewhere is stamped with
+    the version current when the fetch started.
+    """
+
+    def __init__(self, fetcher, async_fetcher=None, clock=time.time, min_ttl=MIN_TTL_SECONDS,
+                 max_entries=MAX_ENTRIES, version=None):
+        self.fetcher = fetcher
+        self.async_fetcher = async_fetcher
+        self.version = version
+        self.clock = clock
+        self.min_ttl = min_ttl
+        self.max_entries = max_entries
+        # extra seconds an expired entry is still served without fetching;
+        # set by RateRefresher, which swaps in new tables on its own
+        self.grace = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def _fresh(self, base):
+        entry = self._entries.get(base)
+        if entry is not None and entry["expires_at"] + self.grace > self.clock():
+            if self.version is not None and entry["version"] != self.version():
+                return None
+            try:
+                self._entries.move_to_end(base)
+            except KeyError:  # evicted by a concurrent store()
+                pass
+            return entry
+        return None
+
+    def peek(self, base):
+        """Current entry for base, expired or not, without fetching."""
+        return self._entries.get(base.upper())
+
+    def get(self, base):
+        """Return the cached table for base, fetching it on a miss.
+
+        Every pair is served from the one table per base, so concurrent
+        misses for any pairs of that base share a single upstream fetch
+        (and its failure) and only differ in the lookup done afterwards.
+        """
+        base = base.upper()
+        entry = self._fresh(base)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        entry, shared = self._flight.do(base, self._fetch, base)
+        self.hits += shared
+        return entry
+
+    def _fetch(self, base):
+        # a flight that finished just before this one started may have stored it
+        entry = self._fresh(base)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        version = self.source_version()
+        try:
+            data = self.fetcher(base)
+        except Exception as e:
+            return self.fall_back(base, e)
+        return self.store(base, data, version)
+
+    async def aget(self, base):
+        """Async variant of get() for the event loop.
+
+        The first miss for a base starts one fetch task; concurrent misses
+        await the same task instead of going upstream themselves.
+        """
+        base = base.upper()
+        entry = self._fresh(base)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        entry, shared = await self._flight.ado(base, self._afetch, base)
+        self.hits += shared
+        return entry
+
+    async def _afetch(self, base):
+        self.misses += 1
+        version = self.source_version()
+        try:
+            data = await self.async_fetcher(base)
+        except Exception as e:
+            return self.fall_back(base, e)
+        return self.store(base, data, version)
+
+    def fall_back(self, base, error):
+        """Serve the last good table as stale when the upstream fails.
+
+        Re-raises the upstream error if there is nothing to fall back to.
+        """
+        entry = self.mark_stale(base)
+        if entry is None:
+            raise error
+        self.stale_served += 1
+        return entry
+
+    def mark_stale(self, base):
+        """Swap in a stale copy of the entry that is retried after STALE_RETRY_SECONDS."""
+        entry = self._entries.get(base)
+        if entry is None:
+            return None
+        entry = dict(entry, stale=True, expires_at=self.clock() + STALE_RETRY_SECONDS)
+        self._entries[base] = entry
+        return entry
+
+    def source_version(self):
+        return self.version() if self.version is not None else None
+
+    def store(self, base, data, version=None):
+        now = self.clock()
+        if version is None:
+            version = self.source_version()
+        expires_at = max(next_publication(data["date"]), now + self.min_ttl)
+        entry = {
+            "base": data["base"],
+            "date": data["date"],
+            "rates": data["rates"],
+            # cross-rate matrix, precomputed once per fetched table
+            "table": data.get("table") or RateTable.from_payload(data),
+            "version": data.get("version", version),
+            "fetched_at": now,
+            "expires_at": expires_at,
+            "stale": False,
+        }
+        self._entries[base] = entry
+        self._entries.move_to_end(base)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            # requests that waited for another request's fetch of the same table
+            "coalesced": self._flight.coalesced,
+            "stale_served": self.stale_served,
+            "entries": {
+                base: {"date": entry["date"], "expires_at": entry["expires_at"], "stale": entry["stale"]}
+                for base, entry in self._entries.items()
+            },
+        }
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+# Frankfurter/ECB publish every rate against EUR; any other pair is a cross rate
+REFERENCE_BASE = "EUR"
+
+
+class UnsupportedPair(ValueError):
+    pass
+
+
+class RateTable:
+    """Full cross-rate matrix derived from one reference-base rate table.
+
+    Currencies are mapped to dense indices and matrix[i, j] holds the rate
+    from currency i to currency j, i.e. rate[j] / rate[i] against the base.
+    The matrix is built once per publication, so every pair is an O(1)
+    lookup afterwards.
+    """
+
+    def __init__(self, base, date, rates):
+        self.base = base
+        self.date = date
+        self.currencies = tuple(sorted({base, *rates}))
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        vector = np.array([1.0 if c == base else rates[c] for c in self.currencies], dtype=np.float64)
+        self.matrix = vector[np.newaxis, :] / vector[:, np.newaxis]
+        # plain lists are faster than numpy for single-element lookups
+        self._rows = self.matrix.tolist()
+
+    @classmethod
+    def from_payload(cls, data):
+        return cls(data["base"], data["date"], data["rates"])
+
+    @classmethod
+    def from_matrix(cls, base, date, currencies, matrix):
+        """Wrap an already computed matrix (e.g. a shared-memory view) without copying it.
+
+        Lookups read the matrix itself, so a worker holds no per-table copy.
+        """
+        table = cls.__new__(cls)
+        table.base = base
+        table.date = date
+        table.currencies = tuple(currencies)
+        table.index = {currency: i for i, currency in enumerate(table.currencies)}
+        table.matrix = matrix
+        table._rows = None
+        return table
+
+    def _position(self, currency):
+        try:
+            return self.index[currency]
+        except KeyError:
+            raise UnsupportedPair(f"Unsupported currency: {currency}") from None
+
+    def rate(self, from_currency, to_currency):
+        i, j = self._position(from_currency), self._position(to_currency)
+        if self._rows is None:
+            return self.matrix.item(i, j)
+        return self._rows[i][j]
+
+    def rates(self, from_currencies, to_currencies):
+        """Vectorised rate() for aligned sequences of currency codes."""
+        return self.matrix[self.positions(from_currencies), self.positions(to_currencies)]
+
+    def positions(self, currencies):
+        codes, inverse = np.unique(np.asarray(currencies, dtype="U3"), return_inverse=True)
+        return np.array([self._position(code) for code in codes.tolist()], dtype=np.intp)[inverse.reshape(-1)]
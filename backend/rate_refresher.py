@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateRefresher:
+    """Background task that keeps a RateCache entry warm.
+
+    It wakes up when the cached table expires (shortly after the next ECB
+    publication), fetches the new table with exponential backoff and swaps
+    it into the cache. While it runs, readers keep getting the current table
+    for `grace` seconds past its expiry instead of fetching themselves. If
+    every attempt fails the entry is marked stale and still served.
+
+    fetch is a coroutine function taking the base currency. on_refresh, if
+    given, is awaited with each newly fetched payload.
+    """
+
+    def __init__(self, cache, base, fetch, on_refresh=None, grace=900,
+                 retry_initial=5, retry_max=300, attempts=5, clock=time.time, sleep=asyncio.sleep):
+        self.cache = cache
+        self.base = base
+        self.fetch = fetch
+        self.on_refresh = on_refresh
+        self.grace = grace
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.attempts = attempts
+        self.clock = clock
+        self.sleep = sleep
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+
+    async def run(self):
+        self.cache.grace = self.grace
+        try:
+            while True:
+                await self.refresh()
+                await self.sleep(self.next_delay())
+        finally:
+            self.cache.grace = 0
+
+    async def refresh(self):
+        """Fetch and swap in the latest table. Returns True on success."""
+        delay = self.retry_initial
+        for attempt in range(1, self.attempts + 1):
+            try:
+                data = await self.fetch(self.base)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning("Rate refresh attempt %d/%d failed: %s", attempt, self.attempts, e)
+                if attempt < self.attempts:
+                    await self.sleep(delay)
+                    delay = min(delay * 2, self.retry_max)
+                continue
+
+            previous = self.cache.peek(self.base)
+            self.cache.store(self.base, data)
+            self.refreshes += 1
+            self.last_error = None
+            if self.on_refresh is not None and (previous is None or previous["date"] != data["date"]):
+                try:
+                    await self.on_refresh(data)
+                except Exception:
+                    logger.exception("Rate refresh hook failed")
+            return True
+
+        self.failures += 1
+        self.cache.mark_stale(self.base)
+        return False
+
+    def next_delay(self):
+        """Seconds until the cached table expires (or its stale retry is due)."""
+        entry = self.cache.peek(self.base)
+        if entry is None:
+            return self.retry_initial
+        return max(entry["expires_at"] - self.clock(), 1)
+
+    def stats(self):
+        entry = self.cache.peek(self.base)
+        return {
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "date": entry["date"] if entry else None,
+            "stale": entry["stale"] if entry else None,
+        }
@@ -0,0 +1,137 @@
+"""Reference rate matrix shared by all workers of one host.
+
+With several uvicorn workers (WEB_CONCURRENCY > 1) one of them, the leader,
+holds an exclusive file lock, refreshes the rates and publishes each new
+matrix into a POSIX shared-memory segment. The other workers map the same
+segment and wrap the matrix in a RateTable without copying it, so the
+upstream is fetched and the matrix built once per host, not once per worker.
+
+Layout: a 16-byte header (version, active slot) followed by two slots, each
+a length-prefixed JSON block (base, date, currencies) and an n x n float64
+matrix. The leader always writes the inactive slot and then flips the
+header, so readers never see a half-written table; a reader re-checks the
+version after reading and retries if it changed underneath it.
+"""
+import fcntl
+import json
+import os
+import struct
+import tempfile
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from rate_engine import RateTable
+
+
+HEADER = struct.Struct("QQ")  # version, active slot
+META_SIZE = 4096
+MAX_CURRENCIES = 64
+
+
+class RateSegment:
+    def __init__(self, name, max_currencies=MAX_CURRENCIES):
+        self.name = name
+        self.max_currencies = max_currencies
+        self.slot_size = META_SIZE + max_currencies * max_currencies * 8
+        size = HEADER.size + 2 * self.slot_size
+        try:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name)
+        # the segment outlives any single worker; keep the resource tracker
+        # from unlinking it when the worker that created it exits
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self.leader = False
+        self._lock_fd = None
+        self._cached_version = 0
+        self._cached = None
+
+    @property
+    def version(self):
+        return HEADER.unpack_from(self._shm.buf, 0)[0]
+
+    def try_lead(self):
+        """Take the leader lock if no other worker holds it. Returns True if this worker leads."""
+        if self.leader:
+            return True
+        if self._lock_fd is None:
+            path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+            self._lock_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.leader = True
+        return True
+
+    def _slot_offset(self, slot):
+        return HEADER.size + slot * self.slot_size
+
+    def publish(self, table):
+        """Write table into the inactive slot and make it current. Returns the new version."""
+        n = len(table.currencies)
+        if n > self.max_currencies:
+            raise ValueError(f"{n} currencies do not fit a segment sized for {self.max_currencies}")
+        meta = json.dumps({"base": table.base, "date": table.date, "currencies": table.currencies}).encode()
+        if len(meta) + 4 > META_SIZE:
+            raise ValueError("rate table metadata does not fit the segment")
+
+        buf = self._shm.buf
+        version, active = HEADER.unpack_from(buf, 0)
+        slot = 1 - active if version else 0
+        offset = self._slot_offset(slot)
+        struct.pack_into("I", buf, offset, len(meta))
+        buf[offset + 4:offset + 4 + len(meta)] = meta
+        matrix = np.ndarray((n, n), dtype=np.float64, buffer=buf, offset=offset + META_SIZE)
+        matrix[:] = table.matrix
+        del matrix  # release the export on the buffer
+        HEADER.pack_into(buf, 0, version + 1, slot)
+        return version + 1
+
+    def read(self):
+        """(RateTable over the shared matrix, version), or (None, 0) before the first publish."""
+        buf = self._shm.buf
+        for _ in range(3):
+            version, slot = HEADER.unpack_from(buf, 0)
+            if version == 0:
+                return None, 0
+            if version == self._cached_version:
+                return self._cached, version
+            offset = self._slot_offset(slot)
+            (length,) = struct.unpack_from("I", buf, offset)
+            meta = json.loads(bytes(buf[offset + 4:offset + 4 + length]))
+            n = len(meta["currencies"])
+            matrix = np.ndarray((n, n), dtype=np.float64, buffer=buf, offset=offset + META_SIZE)
+            table = RateTable.from_matrix(meta["base"], meta["date"], meta["currencies"], matrix)
+            if self.version == version:
+                self._cached_version, self._cached = version, table
+                return table, version
+        raise RuntimeError("rate segment kept changing while being read")
+
+    def read_payload(self):
+        """Frankfurter-style payload for RateCache, carrying the table and its version."""
+        table, version = self.read()
+        if table is None:
+            return None
+        row = table.matrix[table.index[table.base]]
+        rates = {c: float(row[i]) for i, c in enumerate(table.currencies) if c != table.base}
+        return {"base": table.base, "date": table.date, "rates": rates, "table": table, "version": version}
+
+    def stats(self):
+        return {"name": self.name, "version": self.version, "leader": self.leader, "pid": os.getpid()}
+
+    def close(self, unlink=False):
+        self._cached = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.leader = False
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # a RateTable still references the mapping; it goes away with the process
+        if unlink:
+            # unlink() unregisters the segment from the resource tracker again
+            resource_tracker.register(self._shm._name, "shared_memory")
+            self._shm.unlink()
@@ -0,0 +1,161 @@
+"""Rate snapshot files for running without Frankfurter.
+
+A snapshot holds the EUR reference tables of a date range in one compact
+columnar file: a header, the currency codes, the publication days and a
+days x currencies float64 block (NaN where a currency has no rate that
+day). Snapshot opens it with mmap and wraps the columns in numpy views, so
+loading costs the same for one day or twenty-five years; pages are read
+from disk only when they are touched.
+
+    python rate_snapshot.py build rates.fxsnap --start 1999-01-04 [--end 2024-12-31]
+    python rate_snapshot.py build rates.fxsnap --source db --start 2024-01-01
+    python rate_snapshot.py info rates.fxsnap
+"""
+import argparse
+import mmap
+import os
+import struct
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+
+import rate_store
+from frankfurter import fetch_range
+from rate_engine import REFERENCE_BASE
+
+
+MAGIC = b"FXSNAP01"
+# magic, reference base, currency count, day count, offset of the rate block
+HEADER = struct.Struct("<8s3sxIIQ")
+
+
+def _rate_offset(currencies, days):
+    end = HEADER.size + 3 * currencies + 4 * days
+    return (end + 7) // 8 * 8  # float64 block is 8-byte aligned
+
+
+def write_snapshot(path, series, base=REFERENCE_BASE):
+    """Write {date: {currency: rate}} to path atomically. Returns the number of days."""
+    days = sorted(series)
+    currencies = sorted({currency for rates in series.values() for currency in rates} - {base})
+    column = {currency: i for i, currency in enumerate(currencies)}
+    rates = np.full((len(days), len(currencies)), np.nan, dtype="<f8")
+    for row, day in enumerate(days):
+        for currency, rate in series[day].items():
+            if currency != base:
+                rates[row, column[currency]] = rate
+    ordinals = np.array([date.fromisoformat(str(day)).toordinal() for day in days], dtype="<i4")
+
+    offset = _rate_offset(len(currencies), len(days))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, base.encode(), len(currencies), len(days), offset))
+        f.write("".join(currencies).encode())
+        f.write(ordinals.tobytes())
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(rates.tobytes())
+    os.replace(tmp, path)
+    return len(days)
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, base, currencies, days, offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a rate snapshot")
+        self.path = path
+        self.base = base.decode()
+        codes = self._mmap[HEADER.size:HEADER.size + 3 * currencies].decode()
+        self.currencies = tuple(codes[i:i + 3] for i in range(0, len(codes), 3))
+        self.column = {currency: i for i, currency in enumerate(self.currencies)}
+        self.days = np.frombuffer(self._mmap, dtype="<i4", count=days, offset=HEADER.size + 3 * currencies)
+        self.rates = np.frombuffer(self._mmap, dtype="<f8", count=days * currencies,
+                                   offset=offset).reshape(days, currencies)
+
+    def __len__(self):
+        return len(self.days)
+
+    def day(self, index):
+        return date.fromordinal(int(self.days[index])).isoformat()
+
+    def index_on(self, day):
+        """Row of the table in effect on day (that day or the closest earlier one), or None."""
+        index = int(np.searchsorted(self.days, date.fromisoformat(day).toordinal(), side="right")) - 1
+        return index if index >= 0 else None
+
+    def index_range(self, start, end=None):
+        """Rows published between start and end (inclusive), as a range."""
+        first = int(np.searchsorted(self.days, date.fromisoformat(start).toordinal(), side="left"))
+        last = len(self) if end is None else int(
+            np.searchsorted(self.days, date.fromisoformat(end).toordinal(), side="right"))
+        return range(first, last)
+
+    def table(self, index):
+        """{currency: rate} against the reference base for one row, missing rates left out."""
+        row = self.rates[index].tolist()
+        return {currency: rate for currency, rate in zip(self.currencies, row) if rate == rate}
+
+    def info(self):
+        return {
+            "path": self.path,
+            "base": self.base,
+            "currencies": len(self.currencies),
+            "days": len(self),
+            "first": self.day(0) if len(self) else None,
+            "last": self.day(-1) if len(self) else None,
+        }
+
+    def close(self):
+        # numpy views keep the buffer exported; let them go first
+        self.days = self.rates = None
+        self._mmap.close()
+
+
+def fetch_series(start, end, fetch=fetch_range, chunk_days=rate_store.BACKFILL_CHUNK_DAYS):
+    """{date: {currency: rate}} from Frankfurter, in chunks like rate_store.backfill."""
+    day = date.fromisoformat(start)
+    end = date.fromisoformat(end) if end else date.today()
+    series = {}
+    while day <= end:
+        chunk_end = min(day + timedelta(days=chunk_days - 1), end)
+        series.update(fetch(day.isoformat(), chunk_end.isoformat(), REFERENCE_BASE).get("rates", {}))
+        day = chunk_end + timedelta(days=1)
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and inspect rate snapshot files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="write a snapshot of a date range")
+    build_cmd.add_argument("path")
+    build_cmd.add_argument("--start", default=rate_store.FIRST_RATE_DATE)
+    build_cmd.add_argument("--end")
+    build_cmd.add_argument("--source", choices=["frankfurter", "db"], default="frankfurter",
+                           help="Frankfurter (FRANKFURTER_URL) or the local fx_rates store (DATABASE_URL)")
+    info_cmd = sub.add_parser("info", help="print what a snapshot covers")
+    info_cmd.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        snapshot = Snapshot(args.path)
+        print(snapshot.info())
+        snapshot.close()
+        return
+    if args.source == "db":
+        engine = create_engine(os.getenv("DATABASE_URL", "mysql+pymysql://fxuser:fxpass@db:3306/fxdb"))
+        with engine.connect() as conn:
+            series = rate_store.series(conn, args.start, args.end or date.today().isoformat())
+    else:
+        series = fetch_series(args.start, args.end)
+    days = write_snapshot(args.path, series)
+    print(f"Wrote {days} days to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Local store of historical EUR reference rates (table fx_rates).
+
+Filled once by a bulk backfill from Frankfurter and then kept current by
+incremental updates, so historical rates and time series are served from
+indexed local lookups instead of upstream calls.
+
+    python rate_store.py backfill --start 1999-01-04 [--end 2024-12-31]
+    python rate_store.py update
+"""
+import argparse
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, create_engine, text
+
+from frankfurter import fetch_range
+from rate_engine import REFERENCE_BASE, RateTable, UnsupportedPair
+
+
+# ECB series start; Frankfurter has nothing earlier
+FIRST_RATE_DATE = "1999-01-04"
+
+# keep each upstream range request small
+BACKFILL_CHUNK_DAYS = 90
+
+
+def create_rates_table(conn):
+    # PK (currency, rate_date) serves per-currency ranges (/timeseries);
+    # the rate_date index serves whole-day lookups (/rates/{date})
+    if conn.dialect.name == "mysql":
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS fx_rates (
+                currency CHAR(3) NOT NULL,
+                rate_date DATE NOT NULL,
+                rate DECIMAL(18, 6) NOT NULL,
+                PRIMARY KEY (currency, rate_date),
+                INDEX idx_fx_rates_date (rate_date)
+            )
+        """))
+    else:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS fx_rates (
+                currency CHAR(3) NOT NULL,
+                rate_date DATE NOT NULL,
+                rate DECIMAL(18, 6) NOT NULL,
+                PRIMARY KEY (currency, rate_date)
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_fx_rates_date ON fx_rates (rate_date)"))
+
+
+def upsert_statement(conn):
+    if conn.dialect.name == "mysql":
+        return text("""
+            INSERT INTO fx_rates (currency, rate_date, rate) VALUES (:currency, :rate_date, :rate)
+            ON DUPLICATE KEY UPDATE rate = VALUES(rate)
+        """)
+    return text("INSERT OR REPLACE INTO fx_rates (currency, rate_date, rate) VALUES (:currency, :rate_date, :rate)")
+
+
+def save_rates(conn, series):
+    """Upsert {date: {currency: rate}} in one multi-row insert. Returns row count."""
+    rows = [
+        {"currency": currency, "rate_date": day, "rate": rate}
+        for day, rates in series.items()
+        for currency, rate in rates.items()
+    ]
+    if rows:
+        conn.execute(upsert_statement(conn), rows)
+    return len(rows)
+
+
+def last_rate_date(conn):
+    value = conn.execute(text("SELECT MAX(rate_date) FROM fx_rates")).scalar()
+    return str(value) if value is not None else None
+
+
+def backfill(engine, start=FIRST_RATE_DATE, end=None, fetch=fetch_range, chunk_days=BACKFILL_CHUNK_DAYS):
+    """Load every published table between start and end, chunk by chunk."""
+    day = date.fromisoformat(start)
+    end = date.fromisoformat(end) if end else date.today()
+    total = 0
+    while day <= end:
+        chunk_end = min(day + timedelta(days=chunk_days - 1), end)
+        data = fetch(day.isoformat(), chunk_end.isoformat(), REFERENCE_BASE)
+        with engine.begin() as conn:
+            total += save_rates(conn, data.get("rates", {}))
+        print(f"Backfilled {day} .. {chunk_end}: {total} rates so far")
+        day = chunk_end + timedelta(days=1)
+    return total
+
+
+def update(engine, fetch=fetch_range):
+    """Fetch only the tables published since the newest stored date."""
+    with engine.begin() as conn:
+        create_rates_table(conn)
+        last = last_rate_date(conn)
+    start = (date.fromisoformat(last) + timedelta(days=1)).isoformat() if last else FIRST_RATE_DATE
+    if date.fromisoformat(start) > date.today():
+        return 0
+    return backfill(engine, start, fetch=fetch)
+
+
+def published_on(conn, day):
+    """Date of the table in effect on day: day itself or the closest earlier business day."""
+    published = conn.execute(
+        text("SELECT MAX(rate_date) FROM fx_rates WHERE rate_date <= :day"), {"day": day}
+    ).scalar()
+    return str(published) if published is not None else None
+
+
+def table_on(conn, published):
+    """EUR table stored for exactly the publication date."""
+    result = conn.execute(
+        text("SELECT currency, rate FROM fx_rates WHERE rate_date = :day"), {"day": published}
+    )
+    rates = {currency: float(rate) for currency, rate in result}
+    return RateTable(REFERENCE_BASE, published, rates)
+
+
+def rates_on(conn, day):
+    """EUR table published on day, or on the closest earlier business day."""
+    published = published_on(conn, day)
+    if published is None:
+        return None
+    return table_on(conn, published)
+
+
+def series(conn, start, end):
+    """Every stored EUR table between start and end: {date: {currency: rate}}."""
+    result = conn.execute(
+        text("SELECT rate_date, currency, rate FROM fx_rates WHERE rate_date BETWEEN :start AND :end"),
+        {"start": start, "end": end},
+    )
+    by_day = {}
+    for rate_date, currency, rate in result:
+        by_day.setdefault(str(rate_date), {})[currency] = float(rate)
+    return by_day
+
+
+def quote(table, base, symbols=None):
+    """Frankfurter-style {"base", "date", "rates"} for base from a reference table."""
+    symbols = symbols or [c for c in table.currencies if c != base]
+    return {
+        "base": base,
+        "date": table.date,
+        "rates": {symbol: round(table.rate(base, symbol), 6) for symbol in symbols},
+    }
+
+
+def timeseries(conn, start, end, base, symbols):
+    """{date: {symbol: rate}} for base between start and end, cross rates included."""
+    currencies = sorted({base, *symbols} - {REFERENCE_BASE})
+    if not currencies:
+        return {}
+    query = text("""
+        SELECT rate_date, currency, rate FROM fx_rates
+        WHERE currency IN :currencies AND rate_date BETWEEN :start AND :end
+        ORDER BY rate_date
+    """).bindparams(bindparam("currencies", expanding=True))
+    by_day = {}
+    for rate_date, currency, rate in conn.execute(query, {"currencies": currencies, "start": start, "end": end}):
+        by_day.setdefault(str(rate_date), {REFERENCE_BASE: 1.0})[currency] = float(rate)
+
+    series = {}
+    for day, rates in by_day.items():
+        if base not in rates:
+            continue
+        series[day] = {
+            symbol: round(rates[symbol] / rates[base], 6)
+            for symbol in symbols if symbol in rates
+        }
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the local historical rate store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill_cmd = sub.add_parser("backfill", help="bulk load a date range from Frankfurter")
+    backfill_cmd.add_argument("--start", default=FIRST_RATE_DATE)
+    backfill_cmd.add_argument("--end")
+    sub.add_parser("update", help="fetch tables published since the last stored date")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", "mysql+pymysql://fxuser:fxpass@db:3306/fxdb"))
+    if args.command == "backfill":
+        with engine.begin() as conn:
+            create_rates_table(conn)
+        count = backfill(engine, args.start, args.end)
+    else:
+        count = update(engine)
+    print(f"Stored {count} rates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Retention for conversion_history: move old rows into compressed archives.
+
+Rows whose created_at is older than the retention age are written, oldest
+first, to gzip-compressed NDJSON files of at most `chunk_rows` rows and then
+deleted from the live table, one chunk per transaction. A file is named
+after the id range it holds, so re-running an interrupted job rewrites the
+same file instead of duplicating rows. On a MySQL table partitioned by month
+(see migrations.py), whole months past the cutoff are archived and removed
+with DROP PARTITION instead of DELETE.
+
+Archived rows stay readable: read_archives() streams them back with the
+same filters as /history, and /history/export?include_archived=true uses it.
+
+    python retention.py archive --days 90 [--dir archive] [--chunk-rows 50000]
+    python retention.py list [--dir archive]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+import migrations
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ["id", "from_currency", "to_currency", "amount", "rate", "converted", "date", "created_at"]
+ARCHIVE_CHUNK_ROWS = 50000
+ARCHIVE_PATTERN = "history-*.ndjson.gz"
+
+
+def archive_path(archive_dir, rows):
+    return Path(archive_dir) / f"history-{rows[0]['id']:012d}-{rows[-1]['id']:012d}.ndjson.gz"
+
+
+def archive_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def write_archive(archive_dir, rows):
+    """Write one chunk atomically (temp file + rename). Returns its path."""
+    path = archive_path(archive_dir, rows)
+    tmp = path.with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps({col: row[col] for col in ARCHIVE_COLUMNS}, default=archive_value) + "\n")
+    os.replace(tmp, path)
+    return path
+
+
+def select_chunk(conn, cutoff, after_id, chunk_rows):
+    result = conn.execute(text(f"""
+        SELECT {', '.join(ARCHIVE_COLUMNS)} FROM conversion_history
+        WHERE created_at < :cutoff AND id > :after_id
+        ORDER BY id LIMIT :limit
+    """), {"cutoff": cutoff, "after_id": after_id, "limit": chunk_rows})
+    return [dict(row) for row in result.mappings()]
+
+
+def archive_rows(engine, cutoff, archive_dir, chunk_rows, delete=True):
+    """Archive every row created before cutoff, chunk by chunk. Returns (rows, files)."""
+    archived, files, after_id = 0, 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = select_chunk(conn, cutoff, after_id, chunk_rows)
+            if not rows:
+                return archived, files
+            write_archive(archive_dir, rows)
+            if delete:
+                # the file is in place before its rows are deleted in the same transaction
+                conn.execute(text("DELETE FROM conversion_history WHERE id BETWEEN :first AND :last AND created_at < :cutoff"),
+                             {"first": rows[0]["id"], "last": rows[-1]["id"], "cutoff": cutoff})
+        archived += len(rows)
+        files += 1
+        after_id = rows[-1]["id"]
+        logger.info("Archived history rows", extra={"rows": len(rows), "last_id": after_id})
+
+
+def archive(engine, days, archive_dir="archive", chunk_rows=ARCHIVE_CHUNK_ROWS, now=None):
+    """Move rows older than `days` days into archive files. Returns a summary dict."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    summary = {"cutoff": cutoff.isoformat(sep=" ", timespec="seconds"), "rows": 0, "files": 0, "dropped_partitions": []}
+
+    with engine.connect() as lock:
+        # with several workers only one of them runs the job
+        if lock.dialect.name == "mysql" and not lock.execute(text("SELECT GET_LOCK('fx_history_retention', 0)")).scalar():
+            summary["skipped"] = True
+            return summary
+        try:
+            return archive_before(engine, cutoff, archive_dir, chunk_rows, summary)
+        finally:
+            if lock.dialect.name == "mysql":
+                lock.execute(text("SELECT RELEASE_LOCK('fx_history_retention')"))
+
+
+def archive_before(engine, cutoff, archive_dir, chunk_rows, summary):
+    with engine.connect() as conn:
+        partitioned = bool(migrations.partitions(conn))
+    if partitioned:
+        # whole months before the cutoff go with DROP PARTITION after being archived
+        boundary = migrations.month_start(cutoff)
+        rows, files = archive_rows(engine, boundary, archive_dir, chunk_rows, delete=False)
+        with engine.begin() as conn:
+            summary["dropped_partitions"] = migrations.drop_partitions(conn, boundary)
+        summary["rows"] += rows
+        summary["files"] += files
+
+    rows, files = archive_rows(engine, cutoff, archive_dir, chunk_rows)
+    summary["rows"] += rows
+    summary["files"] += files
+    return summary
+
+
+def archive_files(archive_dir):
+    """Archive files, oldest ids first."""
+    directory = Path(archive_dir)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(ARCHIVE_PATTERN))
+
+
+def row_matches(row, from_currency=None, to_currency=None, date_from=None, date_to=None):
+    if from_currency and row["from_currency"] != from_currency.upper():
+        return False
+    if to_currency and row["to_currency"] != to_currency.upper():
+        return False
+    if date_from and (row["date"] is None or row["date"] < date_from):
+        return False
+    if date_to and (row["date"] is None or row["date"] > date_to):
+        return False
+    return True
+
+
+def read_archives(archive_dir, chunk_rows=1000, **filters):
+    """Yield archived rows matching the /history filters, in lists of up to chunk_rows."""
+    chunk = []
+    for path in archive_files(archive_dir):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if row_matches(row, **filters):
+                    chunk.append(row)
+                    if len(chunk) >= chunk_rows:
+                        yield chunk
+                        chunk = []
+    if chunk:
+        yield chunk
+
+
+async def run(engine, days, archive_dir, interval, chunk_rows=ARCHIVE_CHUNK_ROWS):
+    """Scheduled task: archive once per `interval` seconds, off the event loop."""
+    while True:
+        try:
+            summary = await asyncio.to_thread(archive, engine, days, archive_dir, chunk_rows)
+            logger.info("History retention run finished", extra=summary)
+        except Exception:
+            logger.exception("History retention run failed")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old conversion_history rows")
+    sub = parser.add_subparsers(dest="command", required=True)
+    archive_cmd = sub.add_parser("archive")
+    archive_cmd.add_argument("--days", type=int, default=int(os.getenv("HISTORY_RETENTION_DAYS", "90")))
+    archive_cmd.add_argument("--dir", default=os.getenv("HISTORY_ARCHIVE_DIR", "archive"))
+    archive_cmd.add_argument("--chunk-rows", type=int, default=ARCHIVE_CHUNK_ROWS)
+    list_cmd = sub.add_parser("list")
+    list_cmd.add_argument("--dir", default=os.getenv("HISTORY_ARCHIVE_DIR", "archive"))
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in archive_files(args.dir):
+            print(f"{path.name}  {path.stat().st_size} bytes")
+        return
+    engine = create_engine(os.getenv("DATABASE_URL", "mysql+pymysql://fxuser:fxpass@db:3306/fxdb"))
+    summary = archive(engine, args.days, args.dir, args.chunk_rows)
+    print(f"Archived {summary['rows']} rows into {summary['files']} files (created before {summary['cutoff']})")
+    if summary["dropped_partitions"]:
+        print(f"Dropped partitions: {summary['dropped_partitions']}")
+
+
+if __name__ == "__main__":
+    main()
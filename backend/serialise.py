@@ -0,0 +1,66 @@
+"""Typed response rows and a fast JSON response class.
+
+Routes that return plain dicts or SQLAlchemy RowMappings go through
+FastAPI's jsonable_encoder, which inspects every value on every request;
+on large /history pages that dominates the response time. The hot routes
+instead build slotted dataclass rows and return a FastJSONResponse, which
+hands them straight to orjson (serialised natively, no per-field Python
+code). Without orjson installed the stdlib json module is used.
+"""
+import dataclasses
+import datetime
+import json
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def default(value):
+    # DECIMAL columns come back as Decimal, keep them JSON numbers
+    if isinstance(value, Decimal):
+        return float(value)
+    if dataclasses.is_dataclass(value):
+        return {field: getattr(value, field) for field in value.__slots__}
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(value):
+        return orjson.dumps(value, default=default)
+else:
+    loads = json.loads
+
+    def dumps(value):
+        return json.dumps(value, default=default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
+
+
+@dataclasses.dataclass(slots=True)
+class HistoryRow:
+    id: int
+    from_currency: str
+    to_currency: str
+    amount: float
+    rate: float
+    converted: float
+    date: datetime.date | str
+    created_at: Any = None  # not present before the typed history schema
+
+
+def history_rows(rows):
+    """HistoryRow objects for a page of conversion_history mappings"""
+    return [HistoryRow(**row) for row in rows]
@@ -0,0 +1,227 @@
+"""Rate tables shared between replicas.
+
+SharedRates sits between the in-process RateCache and the upstream: on a
+local miss it reads the table another replica already stored, and when the
+shared copy has expired it takes a short lock so only one replica goes
+upstream after each publication while the others wait for its result. If
+the shared backend is unreachable it goes straight upstream.
+
+Backends are chosen by URL (RATE_CACHE_URL):
+    redis://host:6379/0    Redis (needs the redis package)
+    memory://              in-process stand-in, for tests and single replicas
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+
+from rate_cache import MIN_TTL_SECONDS, next_publication
+
+
+logger = logging.getLogger(__name__)
+
+# the lock expires on its own if the replica holding it dies mid-fetch
+LOCK_TTL_SECONDS = 30
+# how long other replicas wait for the lock holder before fetching themselves
+LOCK_WAIT_SECONDS = 5
+LOCK_POLL_SECONDS = 0.1
+
+
+class MemoryBackend:
+    """Dict-backed stand-in with the same semantics as the Redis backend."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        item = self._items.get(key)
+        if item is not None and item[1] <= self.clock():
+            del self._items[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key)
+            return item[0] if item else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (value, self.clock() + ttl)
+
+    def add(self, key, value, ttl):
+        """Set key only if it does not exist. Returns True if it was set."""
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._items[key] = (value, self.clock() + ttl)
+            return True
+
+    def delete(self, key, value=None):
+        """Delete key; with value, only if it still holds that value."""
+        with self._lock:
+            item = self._live(key)
+            if item is not None and (value is None or item[0] == value):
+                del self._items[key]
+
+
+class RedisBackend:
+    # delete the lock only if we still own it
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url, timeout=0.5):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_CACHE_URL=redis://... needs the redis package") from e
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._release = self._client.register_script(self._RELEASE)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(int(ttl), 1))
+
+    def add(self, key, value, ttl):
+        return bool(self._client.set(key, value, ex=max(int(ttl), 1), nx=True))
+
+    def delete(self, key, value=None):
+        if value is None:
+            self._client.delete(key)
+        else:
+            self._release(keys=[key], args=[value])
+
+
+def backend_from_url(url):
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported RATE_CACHE_URL scheme: {url}")
+
+
+class SharedRates:
+    """Shared tier and cross-replica single flight in front of the upstream fetch.
+
+    fetcher / async_fetcher are the upstream calls; fetch() / afetch() have
+    the same signature and are handed to RateCache in their place.
+    """
+
+    def __init__(self, backend, fetcher, async_fetcher=None, lock_ttl=LOCK_TTL_SECONDS,
+                 lock_wait=LOCK_WAIT_SECONDS, poll=LOCK_POLL_SECONDS, clock=time.time,
+                 sleep=time.sleep, async_sleep=asyncio.sleep):
+        self.backend = backend
+        self.fetcher = fetcher
+        self.async_fetcher = async_fetcher
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.poll = poll
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self.shared_hits = 0
+        self.upstream_fetches = 0
+        self.waits = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(base):
+        return f"fx:rates:{base}"
+
+    def _read(self, base):
+        try:
+            value = self.backend.get(self.key(base))
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared rate cache read failed: %s", e)
+            return None
+        if value is None:
+            return None
+        self.shared_hits += 1
+        return json.loads(value)
+
+    def _write(self, base, data):
+        # the shared copy expires with the table, like the local one
+        ttl = max(next_publication(data["date"]) - self.clock(), MIN_TTL_SECONDS)
+        try:
+            self.backend.set(self.key(base), json.dumps(data), ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared rate cache write failed: %s", e)
+
+    def _acquire(self, base, token):
+        """True if we hold the refresh lock, False if another replica does, None if unreachable."""
+        try:
+            return self.backend.add(self.key(base) + ":lock", token, self.lock_ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared rate cache lock failed: %s", e)
+            return None
+
+    def _release(self, base, token):
+        try:
+            self.backend.delete(self.key(base) + ":lock", token)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared rate cache unlock failed: %s", e)
+
+    def fetch(self, base):
+        data = self._read(base)
+        if data is not None:
+            return data
+        token = uuid.uuid4().hex
+        locked = self._acquire(base, token)
+        if locked is False:
+            # another replica is refreshing; pick up its result
+            self.waits += 1
+            deadline = self.clock() + self.lock_wait
+            while self.clock() < deadline:
+                self.sleep(self.poll)
+                data = self._read(base)
+                if data is not None:
+                    return data
+        try:
+            self.upstream_fetches += 1
+            data = self.fetcher(base)
+            self._write(base, data)
+            return data
+        finally:
+            if locked:
+                self._release(base, token)
+
+    async def afetch(self, base):
+        data = await asyncio.to_thread(self._read, base)
+        if data is not None:
+            return data
+        token = uuid.uuid4().hex
+        locked = await asyncio.to_thread(self._acquire, base, token)
+        if locked is False:
+            self.waits += 1
+            deadline = self.clock() + self.lock_wait
+            while self.clock() < deadline:
+                await self.async_sleep(self.poll)
+                data = await asyncio.to_thread(self._read, base)
+                if data is not None:
+                    return data
+        try:
+            self.upstream_fetches += 1
+            data = await self.async_fetcher(base)
+            await asyncio.to_thread(self._write, base, data)
+            return data
+        finally:
+            if locked:
+                await asyncio.to_thread(self._release, base, token)
+
+    def stats(self):
+        return {
+            "shared_hits": self.shared_hits,
+            "upstream_fetches": self.upstream_fetches,
+            "waits": self.waits,
+            "errors": self.errors,
+        }
@@ -0,0 +1,76 @@
+"""Collapse concurrent identical calls into one.
+
+The first caller for a key runs the function; callers arriving while it is
+still running wait for it and get the same result, or the same exception,
+instead of running it again. Nothing is cached once the call has finished.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key single flight for blocking (do) and coroutine (ado) functions."""
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        """Run fn(*args) once for all concurrent callers of key. Returns (result, shared)."""
+        with self._lock:
+            call = self._calls.get(key)
+            shared = call is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+        if shared:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key, fn, *args):
+        """Coroutine variant of do(); fn(*args) must return an awaitable."""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        # shield: a cancelled caller must not cancel the call others wait on
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self):
+        return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": len(self._calls) + len(self._tasks)}
@@ -32,9 +32,11 @@ document.addEventListener('DOMContentLoaded', function() {
   const refreshHistoryBtn = document.getElementById('refresh-history-btn');
   const historyTable = document.getElementById('history-table');
   const historyLoading = document.getElementById('history-loading');
-  function renderHistory(rows) {
+  const moreHistoryBtn = document.getElementById('more-history-btn');
+  let historyCursor = null;
+  function renderHistory(rows, append) {
     const tbody = historyTable.querySelector('tbody');
-    tbody.innerHTML = '';
+    if (!append) tbody.innerHTML = '';
     rows.forEach(row => {
       const tr = document.createElement('tr');
       tr.innerHTML = `
@@ -49,23 +51,31 @@ document.addEventListener('DOMContentLoaded', function() {
       tbody.appendChild(tr);
     });
   }
-  async function fetchHistory() {
+  async function fetchHistory(append) {
     historyLoading.textContent = 'Loading...';
-    historyTable.style.display = 'none';
+    if (!append) {
+      historyTable.style.display = 'none';
+      historyCursor = null;
+    }
     try {
-      const res = await fetch('/history');
+      const url = historyCursor ? `/history?cursor=${historyCursor}` : '/history';
+      const res = await fetch(url);
       if (!res.ok) throw new Error('Failed to fetch history');
       const rows = await res.json();
-      renderHistory(rows);
+      // keyset pagination: the server sends the next cursor while more pages exist
+      historyCursor = res.headers.get('X-Next-Cursor');
+      renderHistory(rows, append);
       historyTable.style.display = '';
       historyLoading.textContent = '';
       refreshHistoryBtn.style.display = '';
+      moreHistoryBtn.style.display = historyCursor ? '' : 'none';
     } catch (err) {
       historyLoading.textContent = err.message;
     }
   }
-  showHistoryBtn.addEventListener('click', fetchHistory);
-  refreshHistoryBtn.addEventListener('click', fetchHistory);
+  showHistoryBtn.addEventListener('click', () => fetchHistory(false));
+  refreshHistoryBtn.addEventListener('click', () => fetchHistory(false));
+  moreHistoryBtn.addEventListener('click', () => fetchHistory(true));
 
   // --- DB Check ---
   document.getElementById('db-check-btn').addEventListener('click', async function() {
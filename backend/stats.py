@@ -0,0 +1,167 @@
+"""Conversion statistics kept in a summary table (conversion_stats).
+
+Every batch of history rows adds its per-(day, pair) totals to the summary
+in the same transaction, so /stats reads a table whose size depends on the
+number of days and pairs, not on the number of conversions.
+
+    python stats.py rebuild    # recompute the summary from conversion_history
+"""
+import argparse
+import os
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+
+def create_stats_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS conversion_stats (
+            day VARCHAR(20) NOT NULL,
+            from_currency VARCHAR(3) NOT NULL,
+            to_currency VARCHAR(3) NOT NULL,
+            conversions BIGINT NOT NULL,
+            total_amount DOUBLE NOT NULL,
+            total_converted DOUBLE NOT NULL,
+            rate_sum DOUBLE NOT NULL,
+            PRIMARY KEY (day, from_currency, to_currency)
+        )
+    """))
+
+
+def upsert_statement(conn):
+    if conn.dialect.name == "mysql":
+        return text("""
+            INSERT INTO conversion_stats (day, from_currency, to_currency, conversions, total_amount, total_converted, rate_sum)
+            VALUES (:day, :from_currency, :to_currency, :conversions, :total_amount, :total_converted, :rate_sum)
+            ON DUPLICATE KEY UPDATE
+                conversions = conversions + VALUES(conversions),
+                total_amount = total_amount + VALUES(total_amount),
+                total_converted = total_converted + VALUES(total_converted),
+                rate_sum = rate_sum + VALUES(rate_sum)
+        """)
+    return text("""
+        INSERT INTO conversion_stats (day, from_currency, to_currency, conversions, total_amount, total_converted, rate_sum)
+        VALUES (:day, :from_currency, :to_currency, :conversions, :total_amount, :total_converted, :rate_sum)
+        ON CONFLICT (day, from_currency, to_currency) DO UPDATE SET
+            conversions = conversions + excluded.conversions,
+            total_amount = total_amount + excluded.total_amount,
+            total_converted = total_converted + excluded.total_converted,
+            rate_sum = rate_sum + excluded.rate_sum
+    """)
+
+
+def aggregate(rows):
+    """Per-(day, pair) deltas for a batch of history rows."""
+    totals = {}
+    for row in rows:
+        key = (row["date"], row["from_currency"], row["to_currency"])
+        delta = totals.get(key)
+        if delta is None:
+            delta = totals[key] = {
+                "day": key[0], "from_currency": key[1], "to_currency": key[2],
+                "conversions": 0, "total_amount": 0.0, "total_converted": 0.0, "rate_sum": 0.0,
+            }
+        delta["conversions"] += 1
+        delta["total_amount"] += row["amount"]
+        delta["total_converted"] += row["converted"]
+        delta["rate_sum"] += row["rate"]
+    return list(totals.values())
+
+
+def aggregate_columns(days, from_currencies, to_currencies, amounts, rates, converted):
+    """aggregate() for column sequences, summed with numpy; used by bulk loads."""
+    groups = {}
+    codes = np.fromiter((groups.setdefault(key, len(groups)) for key in zip(days, from_currencies, to_currencies)),
+                        dtype=np.intp, count=len(days))
+    n = len(groups)
+    counts = np.bincount(codes, minlength=n).tolist()
+    total_amount = np.bincount(codes, weights=amounts, minlength=n).tolist()
+    total_converted = np.bincount(codes, weights=converted, minlength=n).tolist()
+    rate_sum = np.bincount(codes, weights=rates, minlength=n).tolist()
+    return [
+        {"day": day, "from_currency": from_currency, "to_currency": to_currency, "conversions": counts[i],
+         "total_amount": total_amount[i], "total_converted": total_converted[i], "rate_sum": rate_sum[i]}
+        for (day, from_currency, to_currency), i in groups.items()
+    ]
+
+
+def record(conn, rows):
+    """Add a batch of history rows to the summary."""
+    record_deltas(conn, aggregate(rows))
+
+
+def primary_key(delta):
+    return delta["day"], delta["from_currency"], delta["to_currency"]
+
+
+def record_deltas(conn, deltas):
+    """Add precomputed per-(day, pair) deltas to the summary.
+
+    Rows are upserted in primary key order, so concurrent writers lock the
+    (day, pair) rows they share in the same order and cannot deadlock on them.
+    """
+    if deltas:
+        conn.execute(upsert_statement(conn), sorted(deltas, key=primary_key))
+
+
+def rebuild(conn):
+    """Recompute the whole summary from conversion_history."""
+    conn.execute(text("DELETE FROM conversion_stats"))
+    conn.execute(text("""
+        INSERT INTO conversion_stats (day, from_currency, to_currency, conversions, total_amount, total_converted, rate_sum)
+        SELECT date, from_currency, to_currency, COUNT(*), SUM(amount), SUM(converted), SUM(rate)
+        FROM conversion_history
+        WHERE date IS NOT NULL AND from_currency IS NOT NULL AND to_currency IS NOT NULL
+        GROUP BY date, from_currency, to_currency
+    """))
+    return conn.execute(text("SELECT COUNT(*) FROM conversion_stats")).scalar()
+
+
+def query(conn, from_currency=None, to_currency=None, date_from=None, date_to=None):
+    clauses, params = [], {}
+    if from_currency:
+        clauses.append("from_currency = :from_currency")
+        params["from_currency"] = from_currency
+    if to_currency:
+        clauses.append("to_currency = :to_currency")
+        params["to_currency"] = to_currency
+    if date_from:
+        clauses.append("day >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        clauses.append("day <= :date_to")
+        params["date_to"] = date_to
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    result = conn.execute(text(f"""
+        SELECT day, from_currency, to_currency, conversions, total_amount, total_converted, rate_sum
+        FROM conversion_stats {where}
+        ORDER BY day DESC, from_currency, to_currency
+    """), params)
+    return [
+        {
+            "day": str(row.day),
+            "from_currency": row.from_currency,
+            "to_currency": row.to_currency,
+            "conversions": row.conversions,
+            "total_amount": round(row.total_amount, 4),
+            "total_converted": round(row.total_converted, 4),
+            "avg_rate": round(row.rate_sum / row.conversions, 6),
+        }
+        for row in result
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the conversion_stats summary table")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", "mysql+pymysql://fxuser:fxpass@db:3306/fxdb"))
+    with engine.begin() as conn:
+        create_stats_table(conn)
+        count = rebuild(conn)
+    print(f"Rebuilt conversion_stats: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
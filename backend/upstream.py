@@ -0,0 +1,223 @@
+"""Protection around upstream (Frankfurter) calls.
+
+UpstreamClient runs each call through a CircuitBreaker and, optionally, a
+hedge: if the first attempt has not answered after about the p95 of recent
+attempt latencies, a second identical attempt is sent and whichever answers
+first wins. While the breaker is open calls fail immediately with
+CircuitOpen, so RateCache serves its last good table as stale instead of
+every request waiting for timeouts.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the upstream while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures.
+
+    After reset_timeout seconds one trial call is let through (half open);
+    its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+        raise CircuitOpen("upstream circuit breaker is open")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                    logger.warning("Upstream circuit opened after %d failures", self.failures)
+                self.state = OPEN
+                self._opened_at = self.clock()
+                self._trial = False
+
+    def reset(self):
+        self.record_success()
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
+
+
+class LatencyWindow:
+    """Latencies of the most recent attempts, for the hedge delay."""
+
+    def __init__(self, size=200):
+        self._values = collections.deque(maxlen=size)
+
+    def add(self, seconds):
+        self._values.append(seconds)
+
+    def percentile(self, q):
+        values = sorted(self._values)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class UpstreamClient:
+    """Breaker, attempt timing and optional hedging around an upstream call.
+
+    hedge enables the second attempt. Its delay is the p95 of the last
+    attempts once min_samples are known (default_delay before that),
+    never below min_delay.
+    """
+
+    def __init__(self, breaker=None, hedge=False, default_delay=0.5, min_delay=0.05, min_samples=20,
+                 max_workers=8):
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies = LatencyWindow()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._max_workers = max_workers
+        self._executor = None
+
+    def hedge_delay(self):
+        if len(self.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.latencies.percentile(95), self.min_delay)
+
+    def _timed(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.latencies.add(time.perf_counter() - start)
+        return result
+
+    async def _atimed(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = await fn(*args, **kwargs)
+        self.latencies.add(time.perf_counter() - start)
+        return result
+
+    def call(self, fn, *args, **kwargs):
+        self.breaker.before_call()
+        try:
+            if self.hedge:
+                result = self._hedged(fn, *args, **kwargs)
+            else:
+                result = self._timed(fn, *args, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def acall(self, fn, *args, **kwargs):
+        self.breaker.before_call()
+        try:
+            if self.hedge:
+                result = await self._ahedged(fn, *args, **kwargs)
+            else:
+                result = await self._atimed(fn, *args, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _hedged(self, fn, *args, **kwargs):
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self._max_workers, thread_name_prefix="upstream-hedge")
+        first = self._executor.submit(self._timed, fn, *args, **kwargs)
+        done, _ = concurrent.futures.wait([first], timeout=self.hedge_delay())
+        if done:
+            return first.result()
+        # a blocking request cannot be cancelled; the loser runs until its own timeout
+        self.hedges += 1
+        second = self._executor.submit(self._timed, fn, *args, **kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.hedge_wins += future is second
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _ahedged(self, fn, *args, **kwargs):
+        first = asyncio.ensure_future(self._atimed(fn, *args, **kwargs))
+        done, _ = await asyncio.wait([first], timeout=self.hedge_delay())
+        if done:
+            return first.result()
+        self.hedges += 1
+        second = asyncio.ensure_future(self._atimed(fn, *args, **kwargs))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is second
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self):
+        p95 = self.latencies.percentile(95)
+        return {
+            "breaker": self.breaker.stats(),
+            "hedge": self.hedge,
+            "hedge_delay": self.hedge_delay(),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_seconds": round(p95, 4) if p95 is not None else None,
+        }
@@ -0,0 +1,66 @@
+"""Per-row cost of rendering /history pages and /convert bodies.
+
+For /history "before" is the generic FastAPI path (RowMappings through
+jsonable_encoder, then JSONResponse's json.dumps) and "after" is the path
+the route uses now (HistoryRow objects rendered by FastJSONResponse). The
+/convert body was already a JSONResponse; there only the encoder changes. Rows come from a real
+SQLite query so the RowMapping overhead is included.
+
+    python tests/bench/bench_serialise.py
+    python tests/bench/bench_serialise.py --rows 500 --repeat 200
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+import serialise  # noqa: E402
+from serialise import FastJSONResponse, history_rows  # noqa: E402
+
+
+def history_mappings(rows):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE conversion_history (id INTEGER PRIMARY KEY, from_currency TEXT, to_currency TEXT, "
+            "amount REAL, rate REAL, converted REAL, date TEXT, created_at TEXT)"))
+        conn.execute(text(
+            "INSERT INTO conversion_history VALUES (:id, 'EUR', 'USD', 100.0, 1.0912, 109.12, '2024-01-05', "
+            "'2024-01-05 10:00:00')"), [{"id": i} for i in range(rows)])
+        return conn.execute(text("SELECT * FROM conversion_history ORDER BY id DESC")).mappings().all()
+
+
+def per_row_us(fn, rows, repeat):
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    return seconds / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="rows per history page")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    rows = history_mappings(args.rows)
+    before = per_row_us(lambda: JSONResponse(jsonable_encoder(rows)).body, args.rows, args.repeat)
+    after = per_row_us(lambda: FastJSONResponse(history_rows(rows)).body, args.rows, args.repeat)
+
+    conversion = {"from": "EUR", "to": "USD", "amount": 100.0, "rate": 1.0912, "converted": 109.12,
+                  "date": "2024-01-05", "stale": False}
+    convert_before = per_row_us(lambda: JSONResponse(conversion).body, 1, args.repeat * 10)
+    convert_after = per_row_us(lambda: FastJSONResponse(conversion).body, 1, args.repeat * 10)
+
+    print(f"serialiser: {'orjson' if serialise.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'case':<10}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    print(f"{'history':<10}{before:>12.2f}{after:>12.2f}{before / after:>9.1f}x   (per row, {args.rows}-row page)")
+    print(f"{'convert':<10}{convert_before:>12.2f}{convert_after:>12.2f}{convert_before / convert_after:>9.1f}x   (per body)")
+
+
+if __name__ == "__main__":
+    main()
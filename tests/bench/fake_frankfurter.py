@@ -0,0 +1,69 @@
+"""Local Frankfurter stand-in for benchmarks.
+
+Serves /latest and /{start}..{end} with a fixed EUR table, optionally after
+an artificial delay, so runs need no network and are repeatable.
+"""
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+RATE_DATE = "2024-01-05"
+RATES = {
+    "AUD": 1.6353, "BGN": 1.9558, "BRL": 5.3616, "CAD": 1.4631, "CHF": 0.9316, "CNY": 7.8308,
+    "CZK": 24.589, "DKK": 7.4566, "GBP": 0.86115, "HKD": 8.5489, "HUF": 378.23, "IDR": 16989.0,
+    "ILS": 3.9985, "INR": 91.02, "ISK": 150.5, "JPY": 158.4, "KRW": 1437.02, "MXN": 18.6047,
+    "MYR": 5.0787, "NOK": 11.3345, "NZD": 1.7566, "PHP": 60.895, "PLN": 4.3663, "RON": 4.9712,
+    "SEK": 11.2035, "SGD": 1.4593, "THB": 37.717, "TRY": 32.6865, "USD": 1.0945, "ZAR": 20.5067,
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    delay = 0.0
+    requests = 0
+
+    def do_GET(self):
+        Handler.requests += 1
+        if self.delay:
+            time.sleep(self.delay)
+        path = urlparse(self.path).path.strip("/")
+        if path == "latest":
+            body = {"amount": 1.0, "base": "EUR", "date": RATE_DATE, "rates": RATES}
+        elif ".." in path:
+            start, end = (date.fromisoformat(part) for part in path.split(".."))
+            days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+            body = {
+                "amount": 1.0, "base": "EUR", "start_date": start.isoformat(), "end_date": end.isoformat(),
+                "rates": {day.isoformat(): RATES for day in days if day.weekday() < 5},
+            }
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeFrankfurter:
+    def __init__(self, delay=0.0):
+        handler = type("DelayedHandler", (Handler,), {"delay": delay})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,229 @@
+"""Throughput and latency benchmarks for the API.
+
+Runs the app in-process (ASGI transport, real lifespan) against the local
+Frankfurter stand-in and a SQLite database, so it needs neither network nor
+MySQL. Results are written to results.json; with --save-baseline they become
+the new baseline.json, otherwise they are compared with it (if it was run
+with the same settings) and the run exits with status 1 if any scenario
+regressed beyond --tolerance. Cold start (import, lifespan, readiness, first
+served request) is measured too and checked against --cold-start-budget-ms.
+
+    python tests/bench/run_bench.py
+    python tests/bench/run_bench.py --save-baseline
+    python tests/bench/run_bench.py --history-sizes 1000 100000 --requests 2000
+    python tests/bench/run_bench.py --snapshot rates.fxsnap
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from fake_frankfurter import FakeFrankfurter
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parents[1]
+BASELINE = BENCH_DIR / "baseline.json"
+RESULTS = BENCH_DIR / "results.json"
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def measure(client, method, url, requests, concurrency, **kwargs):
+    """Send `requests` calls from `concurrency` workers; latency stats in ms."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / wall, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+def seed_history(main, total):
+    """Grow conversion_history to `total` rows."""
+    from sqlalchemy import text
+
+    with main.engine.begin() as conn:
+        existing = conn.execute(text("SELECT count(*) FROM conversion_history")).scalar()
+        pairs = [("EUR", "USD"), ("USD", "PLN"), ("GBP", "JPY"), ("PLN", "EUR")]
+        rows = [
+            {"from_currency": pairs[i % 4][0], "to_currency": pairs[i % 4][1], "amount": 100.0 + i,
+             "rate": 1.1, "converted": 110.0 + i, "date": f"2024-01-{1 + i % 28:02d}"}
+            for i in range(existing, total)
+        ]
+        for start in range(0, len(rows), 10000):
+            conn.execute(main.INSERT_HISTORY, rows[start:start + 10000])
+
+
+async def wait_ready(client, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while (await client.get("/health/ready")).status_code != 200:
+        if time.perf_counter() > deadline:
+            raise RuntimeError("app did not become ready")
+        await asyncio.sleep(0.01)
+
+
+async def run_scenarios(main, args, cold_start, started):
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # database routes answer 503 until the bootstrap has created the schema
+        await wait_ready(client)
+        cold_start["total_to_ready_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        start = time.perf_counter()
+        await client.get("/convert?from_currency=EUR&to_currency=USD&amount=1")
+        cold_start["first_convert_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        cold_start.update({f"{phase}_ms": round(seconds * 1000, 1) for phase, seconds in main.cold_start.phases.items()})
+
+        results["convert"] = await measure(
+            client, "GET", "/convert?from_currency=USD&to_currency=PLN&amount=100",
+            args.requests, args.concurrency)
+
+        batch = [{"from": "USD", "to": "PLN", "amount": i + 1} for i in range(args.batch_size)]
+        results[f"convert_batch_{args.batch_size}"] = await measure(
+            client, "POST", "/convert/batch", max(args.requests // 50, 10), min(args.concurrency, 4), json=batch)
+
+        for size in args.history_sizes:
+            main.history_writer.stop()  # drain pending conversions so the size is exact
+            seed_history(main, size)
+            main.history_writer.start()
+            results[f"history_{size}"] = await measure(
+                client, "GET", "/history?limit=100", args.requests, args.concurrency)
+            results[f"history_{size}_filtered"] = await measure(
+                client, "GET", "/history?limit=100&from_currency=USD&to_currency=PLN", args.requests, args.concurrency)
+    return results
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="fx-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.chdir(ROOT)  # main mounts ./static relative to the working directory
+    sys.path.insert(0, str(ROOT / "backend"))
+
+    if args.snapshot:
+        # the bundled stand-in serving a rate snapshot, as in offline deployments
+        from frankfurter_standin import StandinServer
+        upstream_server = StandinServer(args.snapshot)
+    else:
+        upstream_server = FakeFrankfurter(delay=args.upstream_delay_ms / 1000)
+
+    with upstream_server as upstream:
+        os.environ["FRANKFURTER_URL"] = upstream.url
+        start = time.perf_counter()
+        import main
+        cold_start = {"import_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+        # frankfurter may have been imported (by the stand-in) before the URL was set
+        main.FRANKFURTER_URL = upstream.url
+        async with main.lifespan(main.app):
+            return await run_scenarios(main, args, cold_start, start), cold_start
+
+
+def settings_changes(settings, baseline):
+    """Settings that differ from the baseline run; results are only comparable without any."""
+    base = baseline.get("settings", {})
+    return [f"{key} {base.get(key)} -> {settings.get(key)}"
+            for key in sorted(set(settings) | set(base)) if settings.get(key) != base.get(key)]
+
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose p95 grew or throughput fell by more than tolerance."""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} rps")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--upstream-delay-ms", type=float, default=20.0)
+    parser.add_argument("--snapshot", help="serve upstream rates from this rate_snapshot file "
+                                           "(frankfurter_standin.py) instead of the fixed stand-in table")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--cold-start-budget-ms", type=float, default=5000,
+                        help="from importing the app until it reports ready")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    scenarios, cold_start = asyncio.run(run(args))
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items()
+                     if k not in ("save_baseline", "tolerance", "cold_start_budget_ms")},
+        "cold_start": cold_start,
+        "scenarios": scenarios,
+    }
+    for name, stats in scenarios.items():
+        print(f"{name:32} {stats['throughput_rps']:>10} rps  p50 {stats['p50_ms']:>8} ms  "
+              f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}")
+    print("cold start " + "  ".join(f"{phase} {ms} ms" for phase, ms in cold_start.items()))
+    cold_start_ms = cold_start["total_to_ready_ms"]
+
+    RESULTS.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline saved to {BASELINE}")
+        return 0
+    if not BASELINE.exists():
+        print("No baseline.json yet, run with --save-baseline")
+        return 0
+    baseline = json.loads(BASELINE.read_text())
+    changes = settings_changes(report["settings"], baseline)
+    if changes:
+        print("Settings differ from baseline.json (" + ", ".join(changes) + "), scenarios not compared")
+        regressions = []
+    else:
+        regressions = compare(scenarios, baseline, args.tolerance)
+    if cold_start_ms > args.cold_start_budget_ms:
+        regressions.append(f"cold start {cold_start_ms:.0f} ms over the {args.cold_start_budget_ms:.0f} ms budget")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import pytest
+
+from batch import compute_batch
+from rate_engine import RateTable, UnsupportedPair
+
+
+TABLE = RateTable("EUR", "2024-01-02", {"USD": 1.1, "PLN": 4.4})
+
+
+def test_compute_batch_uses_cross_rates():
+    rates, converted = compute_batch(
+        TABLE,
+        ["EUR", "USD", "EUR", "EUR", "USD"],
+        ["USD", "EUR", "PLN", "EUR", "PLN"],
+        [10, 11, 2, 5, 1],
+    )
+    assert rates.tolist() == [1.1, 0.9091, 4.4, 1.0, 4.0]
+    assert converted.tolist() == [11.0, 10.0, 8.8, 5.0, 4.0]
+
+
+def test_compute_batch_unknown_currency():
+    with pytest.raises(UnsupportedPair):
+        compute_batch(TABLE, ["EUR"], ["XXX"], [1])
@@ -0,0 +1,74 @@
+import asyncio
+
+from bootstrap import Bootstrap, ColdStart, FirstRequestMiddleware
+
+
+def test_steps_retry_until_they_succeed():
+    calls = []
+    delays = []
+
+    def flaky_schema():
+        calls.append("schema")
+        if len(calls) < 3:
+            raise ConnectionError("mysql not up yet")
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    startup = Bootstrap([("schema", flaky_schema), ("writer", lambda: calls.append("writer"))],
+                        retry_initial=1, retry_max=1.5, sleep=sleep)
+    assert not startup.ready
+
+    asyncio.run(startup.run())
+
+    assert calls == ["schema", "schema", "schema", "writer"]
+    assert delays == [1, 1.5]
+    assert startup.ready
+    assert startup.stats() == {"ready": True, "done": ["schema", "writer"], "pending": [],
+                               "attempts": 4, "last_error": None}
+
+
+def test_pending_steps_are_reported():
+    async def never(seconds):
+        raise asyncio.CancelledError
+
+    def down():
+        raise ConnectionError("mysql down")
+
+    startup = Bootstrap([("schema", down)], sleep=never)
+    try:
+        asyncio.run(startup.run())
+    except asyncio.CancelledError:
+        pass
+
+    stats = startup.stats()
+    assert stats["pending"] == ["schema"]
+    assert stats["last_error"] == "schema: mysql down"
+
+
+def test_cold_start_marks_each_phase_once():
+    now = [10.0]
+    cold_start = ColdStart(clock=lambda: now[0])
+    now[0] = 10.5
+    cold_start.mark("ready")
+    now[0] = 12.0
+    cold_start.mark("ready")
+
+    assert cold_start.stats() == {"ready": 0.5}
+
+
+def test_first_request_middleware():
+    cold_start = ColdStart()
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(scope["type"])
+
+    middleware = FirstRequestMiddleware(app, cold_start)
+    asyncio.run(middleware({"type": "lifespan"}, None, None))
+    assert "first_request" not in cold_start.phases
+    asyncio.run(middleware({"type": "http"}, None, None))
+    asyncio.run(middleware({"type": "http"}, None, None))
+
+    assert "first_request" in cold_start.phases
+    assert seen == ["lifespan", "http", "http"]
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from db_pool import InstrumentedQueuePool, PoolMetrics, pool_settings
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=1, pool_timeout=0.05)
+    yield engine
+    engine.dispose()
+
+
+def test_pool_settings_from_env(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    settings = pool_settings()
+    assert settings["pool_size"] == 20
+    assert settings["pool_pre_ping"] is False
+    assert settings["pool_recycle"] == 1800
+
+
+def test_checkouts_overflow_and_timeouts_are_counted(engine):
+    metrics = PoolMetrics()
+    metrics.attach(engine)
+
+    first = engine.connect()
+    second = engine.connect()  # beyond pool_size -> overflow connection
+    first.execute(text("SELECT 1"))
+    snapshot = metrics.snapshot()
+    assert snapshot["checked_out"] == 2
+    assert snapshot["overflow_events"] == 1
+
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    first.close()
+    second.close()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checkouts"] == 2
+    assert snapshot["timeouts"] == 1
+    assert snapshot["connects"] == 2
+    assert snapshot["wait_max_ms"] >= 50
+
+
+def test_metrics_survive_dispose(engine):
+    metrics = PoolMetrics()
+    metrics.attach(engine)
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert metrics.snapshot()["checkouts"] == 1
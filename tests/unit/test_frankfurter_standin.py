@@ -0,0 +1,71 @@
+import pytest
+import requests
+
+from frankfurter_standin import Standin, StandinServer
+from rate_snapshot import Snapshot, write_snapshot
+
+
+SERIES = {
+    "2024-01-02": {"USD": 1.1, "PLN": 4.4},
+    "2024-01-03": {"USD": 1.2, "PLN": 4.8},
+}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "rates.fxsnap"
+    write_snapshot(path, SERIES)
+    return path
+
+
+@pytest.fixture
+def standin(path):
+    snapshot = Snapshot(path)
+    yield Standin(snapshot)
+    snapshot.close()
+
+
+def test_latest_and_day(standin):
+    assert standin.render("latest", {}) == {
+        "amount": 1.0, "base": "EUR", "date": "2024-01-03", "rates": {"PLN": 4.8, "USD": 1.2}}
+    assert standin.render("2024-01-02", {"to": "USD"})["rates"] == {"USD": 1.1}
+    # a weekend or holiday gets the previous publication
+    assert standin.render("2024-01-06", {})["date"] == "2024-01-03"
+
+
+def test_cross_base_and_amount(standin):
+    body = standin.render("latest", {"from": "usd", "to": "EUR,PLN", "amount": "10"})
+    assert body["base"] == "USD"
+    assert body["rates"] == {"EUR": pytest.approx(10 / 1.2), "PLN": pytest.approx(40.0)}
+
+
+def test_range(standin):
+    body = standin.render("2024-01-01..2024-01-31", {"symbols": "PLN"})
+    assert (body["start_date"], body["end_date"]) == ("2024-01-02", "2024-01-03")
+    assert body["rates"] == {"2024-01-02": {"PLN": 4.4}, "2024-01-03": {"PLN": 4.8}}
+    assert list(standin.render("2024-01-03..", {})["rates"]) == ["2024-01-03"]
+
+
+def test_not_found_and_invalid(standin):
+    assert standin.respond("/latest?from=XXX")[0] == 404
+    assert standin.respond("/latest?to=XXX")[0] == 404
+    assert standin.respond("/1999-01-04")[0] == 404
+    assert standin.respond("/currencies")[0] == 404
+    assert standin.respond("/2024-13-45")[0] == 422
+
+
+def test_responses_are_cached(standin):
+    first = standin.respond("/latest?from=USD")
+    assert standin.respond("/latest?from=USD") is first
+    assert standin.respond.cache_info().hits == 1
+
+
+def test_serves_over_http(path):
+    with StandinServer(path) as server:
+        with requests.Session() as session:
+            latest = session.get(f"{server.url}/latest", params={"from": "EUR"}, timeout=5)
+            series = session.get(f"{server.url}/2024-01-01..2024-01-03", timeout=5)
+
+    assert latest.json()["rates"]["USD"] == 1.2
+    assert latest.headers["Content-Type"] == "application/json"
+    assert len(series.json()["rates"]) == 2
@@ -0,0 +1,140 @@
+import threading
+import time
+
+from sqlalchemy.exc import DataError
+
+from history_writer import HistoryWriter
+
+
+def test_flushes_when_batch_is_full():
+    batches = []
+    writer = HistoryWriter(batches.append, batch_size=3, flush_interval=5)
+    writer.start()
+    for i in range(6):
+        assert writer.submit({"id": i})
+    deadline = time.monotonic() + 2
+    while len(batches) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+
+    assert [len(b) for b in batches] == [3, 3]
+
+
+def test_flushes_after_interval():
+    batches = []
+    writer = HistoryWriter(batches.append, batch_size=100, flush_interval=0.05)
+    writer.start()
+    writer.submit({"id": 1})
+    time.sleep(0.2)
+
+    assert batches == [[{"id": 1}]]
+    writer.stop()
+
+
+def test_stop_drains_queue():
+    batches = []
+    writer = HistoryWriter(batches.append, batch_size=1000, flush_interval=60)
+    writer.start()
+    for i in range(10):
+        writer.submit({"id": i})
+    writer.stop()
+
+    assert sum(len(b) for b in batches) == 10
+    assert writer.stats()["flushed"] == 10
+
+
+def test_full_queue_rejects_rows():
+    release = threading.Event()
+    writer = HistoryWriter(lambda rows: release.wait(), batch_size=1, flush_interval=0, max_queue=1, put_timeout=0.01)
+    writer.start()
+    writer.submit({"id": 1})  # picked up by the blocked flush
+    time.sleep(0.05)
+    assert writer.submit({"id": 2})
+    assert not writer.submit({"id": 3})
+    assert not writer.offer({"id": 3})
+    release.set()
+    writer.stop()
+
+
+def test_not_running_rejects_rows():
+    writer = HistoryWriter(lambda rows: None)
+    assert not writer.submit({"id": 1})
+
+
+def test_failed_flush_is_retried_until_it_succeeds():
+    batches = []
+    failures = [RuntimeError("deadlock"), RuntimeError("gone away")]
+
+    def flush(rows):
+        if failures:
+            raise failures.pop(0)
+        batches.append(rows)
+
+    writer = HistoryWriter(flush, batch_size=2, flush_interval=0, retry_initial=0.01)
+    writer.start()
+    writer.submit({"id": 1})
+    writer.submit({"id": 2})
+    deadline = time.monotonic() + 2
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+
+    assert sum(len(b) for b in batches) == 2
+    assert writer.stats()["retries"] == 2
+    assert writer.stats()["failed"] == 0
+
+
+def test_stop_drops_rows_that_still_fail():
+    def flush(rows):
+        raise RuntimeError("down")
+
+    writer = HistoryWriter(flush, batch_size=10, flush_interval=0, retry_initial=60)
+    writer.start()
+    writer.submit({"id": 1})
+    time.sleep(0.05)
+    started = time.monotonic()
+    writer.stop()
+
+    assert time.monotonic() - started < 5
+    assert writer.stats()["failed"] == 1
+
+
+def test_rows_the_database_refuses_are_isolated_and_dropped():
+    written = []
+
+    def flush(rows):
+        if any(row["id"] == 5 for row in rows):
+            raise DataError("INSERT", {}, Exception("Out of range value for column 'amount'"))
+        written.extend(row["id"] for row in rows)
+
+    writer = HistoryWriter(flush, batch_size=8, flush_interval=60, retry_initial=60)
+    writer.start()
+    for i in range(8):
+        writer.submit({"id": i})
+    deadline = time.monotonic() + 2
+    while len(written) < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = writer.stats()
+    writer.stop()
+
+    assert sorted(written) == [0, 1, 2, 3, 4, 6, 7]
+    assert (stats["failed"], stats["retries"]) == (1, 0)
+
+
+def test_retries_are_capped():
+    attempts = []
+
+    def flush(rows):
+        attempts.append(len(rows))
+        raise RuntimeError("down")
+
+    writer = HistoryWriter(flush, batch_size=1, flush_interval=0, retry_initial=0.001, max_retries=3)
+    writer.start()
+    writer.submit({"id": 1})
+    deadline = time.monotonic() + 2
+    while writer.stats()["failed"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+
+    assert len(attempts) == 4
+    assert writer.stats()["failed"] == 1
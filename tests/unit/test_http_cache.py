@@ -0,0 +1,29 @@
+from http_cache import etag, matches, max_age, not_modified
+
+
+def test_etag_is_stable_and_quoted():
+    assert etag("2024-01-05", "EUR") == etag("2024-01-05", "EUR")
+    assert etag("2024-01-05", "EUR") != etag("2024-01-08", "EUR")
+    assert etag(1).startswith('"') and etag(1).endswith('"')
+
+
+def test_matches_uses_weak_comparison():
+    tag = etag("x")
+    assert matches(tag, tag)
+    assert matches(f'"other", W/{tag}', tag)
+    assert matches("*", tag)
+    assert not matches('"other"', tag)
+    assert not matches(None, tag)
+
+
+def test_not_modified():
+    tag = etag("x")
+    response = not_modified(tag, tag, "private, no-cache")
+    assert response.status_code == 304
+    assert response.headers["ETag"] == tag
+    assert not_modified('"other"', tag, "private, no-cache") is None
+
+
+def test_max_age_never_negative():
+    assert max_age(12.7) == "public, max-age=12"
+    assert max_age(-5, shared=False) == "private, max-age=0"
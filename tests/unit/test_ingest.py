@@ -0,0 +1,142 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import ingest
+import migrations
+import stats
+
+
+CSV = """from_currency,to_currency,amount,rate,converted,date
+EUR,USD,100,1.1,110,2024-01-05
+usd,pln,10,4,,2024-01-05
+EUR,XX,5,1.1,5.5,2024-01-05
+GBP,EUR,20,1.15,23,2024-01-08
+"""
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    migrations.migrate(engine)
+    return engine
+
+
+def history(engine):
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT from_currency, to_currency, amount, rate, converted, date FROM conversion_history ORDER BY id"
+        )).all()
+
+
+def test_csv_ingest_validates_and_loads(engine):
+    summary = ingest.ingest(engine, io.StringIO(CSV), "csv", "partner")
+
+    assert (summary["records"], summary["inserted"], summary["rejected"]) == (4, 3, 1)
+    assert summary["errors"] == [{"record": 3, "error": "currencies must be 3-letter codes"}]
+    rows = history(engine)
+    assert [(r[0], r[1], str(r[5])) for r in rows] == [
+        ("EUR", "USD", "2024-01-05"), ("USD", "PLN", "2024-01-05"), ("GBP", "EUR", "2024-01-08")]
+    # converted is derived when missing
+    assert float(rows[1][4]) == 40.0
+    with engine.connect() as conn:
+        assert [row["conversions"] for row in stats.query(conn)] == [1, 1, 1]
+
+
+def test_ndjson_accepts_response_field_names_and_reports_bad_lines(engine):
+    lines = [
+        json.dumps({"from": "EUR", "to": "USD", "amount": 1, "rate": 1.1, "date": "2024-01-05", "stale": False}),
+        "{not json",
+        json.dumps({"from_currency": "EUR", "to_currency": "USD", "amount": -1, "rate": 1.1, "date": "2024-01-05"}),
+        json.dumps({"from_currency": "EUR", "to_currency": "USD", "amount": 1, "rate": 1.1, "date": "2024-02-30"}),
+        json.dumps([1, 2]),
+        "",
+        json.dumps({"id": 7, "from_currency": "EUR", "to_currency": "PLN", "amount": 2, "rate": 4.3,
+                    "converted": 8.6, "date": "2024-01-05 00:00:00"}),
+    ]
+
+    summary = ingest.ingest(engine, io.StringIO("\n".join(lines) + "\n"), "ndjson", "nd", chunk_rows=3)
+
+    assert (summary["inserted"], summary["rejected"]) == (2, 4)
+    assert [e["record"] for e in summary["errors"]] == [2, 3, 4, 5]
+    assert summary["errors"][0]["error"] == "invalid JSON"
+    assert [(r[1], str(r[5])) for r in history(engine)] == [("USD", "2024-01-05"), ("PLN", "2024-01-05")]
+
+
+def test_numbers_outside_the_history_columns_are_rejected_per_record(engine):
+    data = """from_currency,to_currency,amount,rate,converted,date
+EUR,USD,inf,1.1,,2024-01-05
+EUR,USD,1,nan,1.1,2024-01-05
+EUR,USD,1,1.1,-inf,2024-01-05
+EUR,USD,1e17,100,,2024-01-05
+EUR,USD,1,1.1,1.1,2024-01-05
+EUR,USD,1e18,1.1,,2024-01-05
+EUR,USD,1,1e12,,2024-01-05
+EUR,USD,1,1.1,1e20,2024-01-05
+"""
+    summary = ingest.ingest(engine, io.StringIO(data), "csv", "inf")
+
+    assert (summary["inserted"], summary["rejected"]) == (1, 7)
+    assert [e["record"] for e in summary["errors"]] == [1, 2, 3, 4, 6, 7, 8]
+    assert summary["errors"][5] == {"record": 7, "error": "rate must be a positive number below 1e+12"}
+    assert [float(r[2]) for r in history(engine)] == [1.0]
+
+
+def test_missing_column_rejects_every_record(engine):
+    summary = ingest.ingest(engine, io.StringIO("from_currency,to_currency,amount\nEUR,USD,1\n"), "csv", "bad")
+
+    assert (summary["inserted"], summary["rejected"]) == (0, 1)
+    assert history(engine) == []
+
+
+def test_interrupted_job_resumes_without_duplicates(engine, monkeypatch):
+    data = "from_currency,to_currency,amount,rate,date\n" + "".join(
+        f"EUR,USD,{i + 1},1.1,2024-01-05\n" for i in range(10))
+    load = ingest.insert_rows
+    calls = []
+
+    def failing_load(conn, columns):
+        calls.append(len(columns[0]))
+        if len(calls) == 3:
+            raise ConnectionError("lost connection")
+        load(conn, columns)
+
+    monkeypatch.setattr(ingest, "insert_rows", failing_load)
+    with pytest.raises(ConnectionError):
+        ingest.ingest(engine, io.StringIO(data), "csv", "job", chunk_rows=4)
+    with engine.connect() as conn:
+        assert ingest.checkpoint(conn, "job")["records"] == 8
+    assert len(history(engine)) == 8
+
+    monkeypatch.setattr(ingest, "insert_rows", load)
+    summary = ingest.ingest(engine, io.StringIO(data), "csv", "job", chunk_rows=4)
+
+    assert summary["resumed_from"] == 8
+    assert (summary["records"], summary["inserted"]) == (10, 10)
+    assert [float(row[2]) for row in history(engine)] == [float(i) for i in range(1, 11)]
+    with engine.connect() as conn:
+        assert ingest.checkpoint(conn, "job")["finished"] is True
+
+    # a finished job is not loaded twice
+    again = ingest.ingest(engine, io.StringIO(data), "csv", "job", chunk_rows=4)
+    assert again["inserted"] == 10 and len(history(engine)) == 10
+
+
+def test_load_data_falls_back_to_inserts_outside_mysql(engine):
+    summary = ingest.ingest(engine, io.StringIO(CSV), "csv", "ld", method="load-data")
+    assert summary["inserted"] == 3
+
+
+def test_progress_is_reported_per_chunk(engine):
+    seen = []
+    ingest.ingest(engine, io.StringIO(CSV), "csv", "p", chunk_rows=2, progress=seen.append)
+    assert [summary["records"] for summary in seen] == [2, 4]
+    assert seen[-1]["records_per_second"] > 0
+
+
+def test_unknown_format(engine):
+    with pytest.raises(ValueError):
+        ingest.ingest(engine, io.StringIO(CSV), "xml", "x")
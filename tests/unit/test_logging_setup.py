@@ -0,0 +1,25 @@
+import json
+import logging
+
+from logging_setup import DebugSampler, JsonFormatter
+
+
+def make_record(level=logging.INFO, **extra):
+    record = logging.LogRecord("fx", level, __file__, 1, "converted %s", ("EUR",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    payload = json.loads(JsonFormatter().format(make_record(rows=3)))
+
+    assert payload["msg"] == "converted EUR"
+    assert payload["level"] == "INFO"
+    assert payload["rows"] == 3
+
+
+def test_debug_sampler_only_drops_debug_records():
+    sampler = DebugSampler(0.0)
+    assert not sampler.filter(make_record(logging.DEBUG))
+    assert sampler.filter(make_record(logging.INFO))
+    assert DebugSampler(1.0).filter(make_record(logging.DEBUG))
@@ -1,18 +1,33 @@
+import asyncio
+import json
 import pytest
-from backend.main import app
+from backend.main import app, rate_cache, convert_async, INSERT_HISTORY, upstream_client, fetch_latest_rates, startup
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+import rate_store
+import stats
+import retention
+import migrations
+from unittest.mock import patch, MagicMock, AsyncMock
 
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def bootstrapped():
+    # the lifespan (and with it the bootstrap) does not run for this client
+    with patch.object(startup, "done", [name for name, _ in startup.steps]):
+        yield
+
 
 @patch("backend.main.requests.get")
 @patch("backend.main.engine")
 
 
 def test_convert_success(mock_engine, mock_requests):
+    rate_cache.clear()
 # 🔌 Mock API response
     mock_response = MagicMock()
     mock_response.json.return_value = {
@@ -41,6 +56,31 @@ def test_convert_success(mock_engine, mock_requests):
 
 
 
+@patch("backend.main.requests.get")
+@patch("backend.main.engine")
+def test_convert_uses_cached_rate_table(mock_engine, mock_requests):
+    rate_cache.clear()
+    mock_response = MagicMock()
+    mock_response.json.return_value = {
+        "base": "EUR",
+        "rates": {"USD": 1.1, "PLN": 4.3},
+        "date": "2024-01-01"
+    }
+    mock_requests.return_value = mock_response
+    mock_engine.begin.return_value.__enter__.return_value = MagicMock()
+
+    first = client.get("/convert?from_currency=EUR&to_currency=USD&amount=10")
+    second = client.get("/convert?from_currency=usd&to_currency=PLN&amount=2")
+
+    assert first.json()["converted"] == 11.0
+    # cross rate triangulated from the EUR table
+    assert second.json()["rate"] == 3.9091
+    assert second.json()["from"] == "USD"
+    assert mock_requests.call_count == 1
+    assert mock_requests.call_args.kwargs["params"] == {"from": "EUR"}
+    assert client.get("/cache/stats").json()["hits"] == 1
+
+
 @patch("backend.main.engine")
 def test_db_check_success(mock_engine):
     mock_conn = MagicMock()
@@ -69,4 +109,449 @@ def test_history_success(mock_engine):
 
 
 def test_convert():
-    pass
\ No newline at end of file
+    pass
+
+
+def test_liveness():
+    assert client.get("/health/live").json() == {"status": "alive"}
+
+
+@patch("backend.main.engine")
+def test_readiness_waits_for_bootstrap_and_rate_cache(mock_engine):
+    rate_cache.clear()
+    with patch.object(startup, "done", []):
+        response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"] == {"bootstrap": False, "rate_cache": False, "database": True}
+
+    rate_cache.store("EUR", {"base": "EUR", "date": "2024-01-05", "rates": {"USD": 1.1}})
+    with patch.object(startup, "done", [name for name, _ in startup.steps]):
+        response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert "ready" in response.json()["cold_start"]
+
+
+@patch("backend.main.engine")
+def test_database_routes_wait_for_schema(mock_engine):
+    with patch.object(startup, "done", []):
+        convert = client.get("/convert?from_currency=EUR&to_currency=USD&amount=1")
+        history = client.get("/history")
+    assert convert.status_code == 503
+    assert convert.headers["retry-after"] == "1"
+    assert history.status_code == 503
+    assert not mock_engine.begin.called
+    assert client.get("/health/live").status_code == 200
+
+
+def test_rate_refresher_starts_after_bootstrap():
+    from backend import main
+
+    async def scenario():
+        bootstrapped = asyncio.get_running_loop().create_future()
+        with patch.object(main.rate_refresher, "run", AsyncMock()) as run:
+            task = asyncio.create_task(main.refresh_rates(bootstrapped))
+            await asyncio.sleep(0.01)
+            assert not run.called
+            bootstrapped.set_result(None)
+            await task
+            assert run.called
+
+    asyncio.run(scenario())
+
+
+@patch("backend.main.engine")
+def test_readiness_reports_database_down(mock_engine):
+    mock_engine.connect.side_effect = ConnectionError("mysql down")
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["database"] is False
+
+@patch("backend.main.async_engine")
+def test_convert_async_success(mock_async_engine):
+    rate_cache.clear()
+    mock_conn = AsyncMock()
+    mock_async_engine.begin.return_value.__aenter__.return_value = mock_conn
+
+    async def fake_fetch(base):
+        return {"base": "USD", "rates": {"EUR": 0.9}, "date": "2024-01-01"}
+
+    with patch.object(rate_cache, "async_fetcher", fake_fetch):
+        response = asyncio.run(convert_async(from_currency="usd", to_currency="eur", amount=10,
+                                              if_none_match=None))
+
+    data = json.loads(response.body)
+    assert data["converted"] == 9.0
+    assert data["rate"] == 0.9
+    assert response.headers["ETag"]
+    mock_conn.run_sync.assert_awaited_once()
+
+
+@patch("backend.main.history_writer")
+@patch("backend.main.requests.get")
+def test_convert_revalidation_returns_304_without_recording(mock_requests, mock_writer):
+    rate_cache.clear()
+    mock_requests.return_value = MagicMock(status_code=200, json=lambda: {"base": "EUR", "date": "2024-01-05", "rates": {"USD": 1.1}})
+    mock_writer.submit.return_value = True
+
+    first = client.get("/convert?from_currency=EUR&to_currency=USD&amount=10")
+    assert first.headers["Cache-Control"].startswith("public, max-age=")
+
+    second = client.get("/convert?from_currency=EUR&to_currency=USD&amount=10",
+                        headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    assert mock_writer.submit.call_count == 1
+
+    other = client.get("/convert?from_currency=EUR&to_currency=USD&amount=20",
+                       headers={"If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200
+
+
+@patch("backend.main.engine")
+def test_history_keyset_page(mock_engine):
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.mappings().all.return_value = [
+        {"id": i, "from_currency": "EUR", "to_currency": "USD", "amount": 1, "rate": 1.1, "converted": 1.1, "date": "2025-07-23"}
+        for i in (9, 8, 7)
+    ]
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    response = client.get("/history?limit=2&cursor=10&from_currency=eur&date_from=2025-07-01")
+
+    assert [row["id"] for row in response.json()] == [9, 8]
+    assert response.headers["X-Next-Cursor"] == "8"
+    query, params = mock_conn.execute.call_args.args
+    assert "id < :cursor" in str(query)
+    assert params == {"from_currency": "EUR", "date_from": "2025-07-01", "cursor": 10, "limit": 3}
+
+
+def test_history_rejects_oversized_page():
+    response = client.get("/history?limit=100000")
+    assert response.status_code == 422
+
+
+EXPORT_ROWS = [
+    {"id": 1, "from_currency": "EUR", "to_currency": "USD", "amount": 100.0, "rate": 1.1, "converted": 110.0, "date": "2025-07-23"},
+    {"id": 2, "from_currency": "USD", "to_currency": "PLN", "amount": 5.0, "rate": 3.9, "converted": 19.5, "date": "2025-07-24"},
+]
+
+
+def test_history_version_does_not_scan_the_table():
+    from backend.main import HISTORY_VERSION
+
+    store = create_engine("sqlite://", poolclass=StaticPool)
+    migrations.migrate(store)
+    with store.connect() as conn:
+        plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {HISTORY_VERSION.text}"))]
+        assert conn.execute(HISTORY_VERSION).one() == (None, None)
+    assert not any(step.startswith("SCAN conversion_history") for step in plan)
+
+
+def test_history_etag_and_304():
+    db = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    migrations.migrate(db)
+    with db.begin() as conn:
+        conn.execute(INSERT_HISTORY, {"from_currency": "EUR", "to_currency": "USD", "amount": 1.0,
+                                      "rate": 1.1, "converted": 1.1, "date": "2024-01-05"})
+
+    with patch("backend.main.engine", db):
+        first = client.get("/history")
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        cached = client.get("/history", headers={"If-None-Match": first.headers["ETag"]})
+        assert cached.status_code == 304
+
+        with db.begin() as conn:
+            conn.execute(INSERT_HISTORY, {"from_currency": "USD", "to_currency": "PLN", "amount": 1.0,
+                                          "rate": 4.0, "converted": 4.0, "date": "2024-01-05"})
+        changed = client.get("/history", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
+
+
+@patch("backend.main.history_writer")
+@patch("backend.main.requests.get")
+def test_open_circuit_serves_cached_rates_without_calling_upstream(mock_requests, mock_writer):
+    rate_cache.clear()
+    rate_cache.store("EUR", {"base": "EUR", "date": "2024-01-05", "rates": {"USD": 1.1}})
+    rate_cache.peek("EUR")["expires_at"] = 0  # due for a refetch
+    mock_writer.submit.return_value = True
+    breaker = upstream_client.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    try:
+        response = client.get("/convert?from_currency=EUR&to_currency=USD&amount=10")
+    finally:
+        breaker.reset()
+
+    assert response.json()["stale"] is True
+    assert response.json()["converted"] == 11.0
+    mock_requests.assert_not_called()
+
+
+@patch("backend.main.requests.get")
+def test_upstream_calls_have_timeouts(mock_requests):
+    rate_cache.clear()
+    mock_requests.return_value.json.return_value = {"base": "EUR", "date": "2024-01-05", "rates": {"USD": 1.1}}
+
+    fetch_latest_rates("EUR")
+
+    connect, read = mock_requests.call_args.kwargs["timeout"]
+    assert connect > 0 and read > 0
+
+
+@patch("backend.main.engine")
+def test_export_ndjson_streams_partitions(mock_engine):
+    mock_conn = MagicMock()
+    mock_result = mock_conn.execution_options.return_value.execute.return_value
+    mock_result.mappings.return_value.partitions.return_value = iter([EXPORT_ROWS[:1], EXPORT_ROWS[1:]])
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    response = client.get("/history/export?from_currency=eur")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2]
+    assert mock_conn.execution_options.call_args.kwargs["stream_results"] is True
+
+
+@patch("backend.main.engine")
+def test_export_csv(mock_engine):
+    mock_conn = MagicMock()
+    mock_result = mock_conn.execution_options.return_value.execute.return_value
+    mock_result.mappings.return_value.partitions.return_value = iter([EXPORT_ROWS])
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    response = client.get("/history/export?format=csv")
+
+    lines = response.text.splitlines()
+    assert lines[0] == "id,from_currency,to_currency,amount,rate,converted,date"
+    assert lines[2] == "2,USD,PLN,5.0,3.9,19.5,2025-07-24"
+
+
+@patch("backend.main.engine")
+def test_export_includes_archived_rows_first(mock_engine, tmp_path):
+    archived = dict(EXPORT_ROWS[0], id=0, created_at="2025-01-01 00:00:00")
+    retention.write_archive(tmp_path, [archived])
+    mock_conn = MagicMock()
+    mock_result = mock_conn.execution_options.return_value.execute.return_value
+    mock_result.mappings.return_value.partitions.return_value = iter([EXPORT_ROWS])
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+
+    with patch("backend.main.HISTORY_ARCHIVE_DIR", tmp_path):
+        response = client.get("/history/export?include_archived=true&from_currency=EUR")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [0, 1, 2]
+    assert "created_at" not in rows[0]
+
+
+@patch("backend.main.requests.get")
+@patch("backend.main.engine")
+def test_convert_batch_single_fetch_and_bulk_insert(mock_engine, mock_requests):
+    rate_cache.clear()
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"base": "EUR", "rates": {"USD": 1.25, "PLN": 5.0}, "date": "2024-01-01"}
+    mock_requests.return_value = mock_response
+    mock_conn = MagicMock()
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+
+    items = [{"from": "EUR", "to": "USD", "amount": 10}, {"from": "usd", "to": "PLN", "amount": 2},
+             {"from": "USD", "to": "EUR", "amount": 10}] * 100
+    response = client.post("/convert/batch", json=items)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 300
+    assert [r["converted"] for r in data["results"][:3]] == [12.5, 8.0, 8.0]
+    assert mock_requests.call_count == 1
+    history_insert, stats_upsert = mock_conn.execute.call_args_list
+    assert len(history_insert.args[1]) == 300
+    # one summary delta per (day, pair)
+    assert len(stats_upsert.args[1]) == 3
+
+
+@patch("backend.main.requests.get")
+@patch("backend.main.history_writer")
+def test_convert_rejects_amounts_outside_the_history_columns(mock_writer, mock_requests):
+    rate_cache.clear()
+    mock_requests.return_value.json.return_value = {"base": "EUR", "rates": {"USD": 1.25}, "date": "2024-01-01"}
+
+    for amount in ("inf", "nan", "1e20"):
+        response = client.get(f"/convert?from_currency=EUR&to_currency=USD&amount={amount}")
+        assert response.status_code == 422, amount
+    # in range itself, but the converted amount is not
+    response = client.get("/convert?from_currency=EUR&to_currency=USD&amount=9e17")
+    assert response.status_code == 422
+    assert not mock_writer.submit.called
+
+
+@patch("backend.main.requests.get")
+@patch("backend.main.engine")
+def test_convert_batch_rejects_amounts_outside_the_history_columns(mock_engine, mock_requests):
+    rate_cache.clear()
+    mock_requests.return_value.json.return_value = {"base": "EUR", "rates": {"USD": 1.25}, "date": "2024-01-01"}
+
+    too_large = client.post("/convert/batch", json=[{"from": "EUR", "to": "USD", "amount": 1e20}])
+    overflowing = client.post("/convert/batch", json=[{"from": "EUR", "to": "USD", "amount": 1},
+                                                      {"from": "EUR", "to": "USD", "amount": 9e17}])
+    infinite = client.post("/convert/batch", content='[{"from": "EUR", "to": "USD", "amount": Infinity}]',
+                           headers={"Content-Type": "application/json"})
+
+    assert (too_large.status_code, overflowing.status_code, infinite.status_code) == (422, 422, 422)
+    assert not mock_engine.begin.called
+
+
+def test_convert_batch_too_large():
+    with patch("backend.main.BATCH_MAX_ITEMS", 1):
+        response = client.post("/convert/batch", json=[{"from": "EUR", "to": "USD", "amount": 1}] * 2)
+    assert response.status_code == 413
+
+
+def test_rates_and_timeseries_served_from_local_store():
+    store = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with store.begin() as conn:
+        rate_store.create_rates_table(conn)
+        rate_store.save_rates(conn, {"2024-01-05": {"USD": 1.25, "PLN": 5.0}, "2024-01-08": {"USD": 2.0, "PLN": 5.0}})
+
+    with patch("backend.main.engine", store):
+        rates = client.get("/rates/2024-01-06?base=usd&symbols=PLN")
+        series = client.get("/timeseries?start_date=2024-01-01&end_date=2024-01-31&symbols=USD")
+        missing = client.get("/rates/2023-01-01")
+        no_symbols = [client.get(f"/timeseries?start_date=2024-01-01&end_date=2024-01-31&symbols={symbols}")
+                      for symbols in ("", ",", "%20")]
+
+    assert [response.status_code for response in no_symbols] == [422, 422, 422]
+    assert rates.json() == {"base": "USD", "date": "2024-01-05", "rates": {"PLN": 4.0}}
+    assert series.json()["rates"] == {"2024-01-05": {"USD": 1.25}, "2024-01-08": {"USD": 2.0}}
+    assert missing.status_code == 404
+
+
+def test_rates_conditional_requests():
+    store = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with store.begin() as conn:
+        rate_store.create_rates_table(conn)
+        rate_store.save_rates(conn, {"2024-01-05": {"USD": 1.25}})
+
+    with patch("backend.main.engine", store):
+        exact = client.get("/rates/2024-01-05")
+        fallback = client.get("/rates/2024-01-06")
+        revalidated = client.get("/rates/2024-01-06", headers={"If-None-Match": f'W/{fallback.headers["ETag"]}'})
+        with store.begin() as conn:
+            rate_store.save_rates(conn, {"2024-01-06": {"USD": 1.5}})
+        superseded = client.get("/rates/2024-01-06", headers={"If-None-Match": fallback.headers["ETag"]})
+
+    assert exact.headers["Cache-Control"] == "public, max-age=86400"
+    assert fallback.headers["Cache-Control"] == "public, max-age=3600"
+    assert revalidated.status_code == 304
+    assert superseded.status_code == 200
+    assert superseded.json()["date"] == "2024-01-06"
+
+
+@patch("backend.main.requests.get")
+@patch("backend.main.engine")
+def test_metrics_exposes_route_and_stage_latency(mock_engine, mock_requests):
+    rate_cache.clear()
+    mock_requests.return_value.json.return_value = {"base": "EUR", "rates": {"USD": 1.1}, "date": "2024-01-01"}
+    mock_engine.begin.return_value.__enter__.return_value = MagicMock()
+    client.get("/convert?from_currency=EUR&to_currency=USD&amount=1")
+
+    body = client.get("/metrics").text
+
+    assert 'fx_http_request_duration_seconds_count{method="GET",route="/convert",status="200"}' in body
+    assert 'fx_convert_stage_seconds_count{stage="upstream_fetch"}' in body
+    assert 'fx_convert_stage_seconds_count{stage="serialise"}' in body
+    assert 'fx_rate_cache_requests_total{result="miss"} 1' in body
+
+
+def test_stats_served_from_summary_table():
+    db = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with db.begin() as conn:
+        stats.create_stats_table(conn)
+        stats.record(conn, [
+            {"date": "2024-01-05", "from_currency": "EUR", "to_currency": "USD", "amount": 10.0, "rate": 1.1, "converted": 11.0},
+            {"date": "2024-01-05", "from_currency": "EUR", "to_currency": "USD", "amount": 20.0, "rate": 1.2, "converted": 24.0},
+        ])
+
+    with patch("backend.main.engine", db):
+        response = client.get("/stats?from_currency=eur")
+
+    assert response.json() == [{
+        "day": "2024-01-05", "from_currency": "EUR", "to_currency": "USD",
+        "conversions": 2, "total_amount": 30.0, "total_converted": 35.0, "avg_rate": 1.15,
+    }]
+
+
+def test_rate_segment_leader_publishes_and_follower_reads():
+    from datetime import date
+    from rate_segment import RateSegment
+    import backend.main as main
+
+    today = date.today().isoformat()
+    name = f"fx_test_main_{today}"
+    leader, follower = RateSegment(name), RateSegment(name)
+    upstream = MagicMock(return_value={"base": "EUR", "date": today, "rates": {"USD": 1.1}})
+    try:
+        assert leader.try_lead()
+        with patch.object(main, "upstream_fetch", upstream):
+            with patch.object(main, "rate_segment", leader):
+                published = main.segment_fetch("EUR")
+            with patch.object(main, "rate_segment", follower):
+                read = main.segment_fetch("EUR")
+        assert upstream.call_count == 1
+        assert published["version"] == read["version"] == 1
+        assert read["table"].rate("EUR", "USD") == pytest.approx(1.1)
+    finally:
+        leader.close()
+        follower.close(unlink=True)
+
+
+def test_rate_segment_follower_warms_from_segment():
+    from datetime import date
+    from rate_engine import RateTable
+    from rate_segment import RateSegment
+    import backend.main as main
+
+    today = date.today().isoformat()
+    name = f"fx_test_warm_{today}"
+    leader, follower = RateSegment(name), RateSegment(name)
+    try:
+        assert leader.try_lead()
+
+        async def scenario():
+            with patch.object(main, "rate_segment", follower), \
+                    patch.object(main, "RATE_SEGMENT_LEAD_INTERVAL", 0.01):
+                task = asyncio.create_task(main.lead_rate_segment(asyncio.get_running_loop().create_future()))
+                await asyncio.sleep(0.05)
+                assert rate_cache.peek("EUR") is None
+                leader.publish(RateTable.from_payload({"base": "EUR", "date": today, "rates": {"USD": 1.1}}))
+                await asyncio.sleep(0.05)
+                task.cancel()
+            return rate_cache.peek("EUR")
+
+        rate_cache.clear()
+        entry = asyncio.run(scenario())
+        assert entry["version"] == 1
+        assert entry["table"].rate("EUR", "USD") == pytest.approx(1.1)
+    finally:
+        rate_cache.clear()
+        leader.close()
+        follower.close(unlink=True)
+
+
+def test_bulk_ingest_endpoint_and_status():
+    db = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    migrations.migrate(db)
+    body = "from,to,amount,rate,date\nEUR,USD,10,1.1,2024-01-05\nEUR,USD,0,1.1,2024-01-05\n"
+
+    with patch("backend.main.engine", db):
+        response = client.post("/history/ingest?format=csv&job=partner-1", content=body)
+        status = client.get("/history/ingest/partner-1")
+        missing = client.get("/history/ingest/nope")
+
+    assert response.status_code == 200
+    assert (response.json()["inserted"], response.json()["rejected"]) == (1, 1)
+    assert status.json()["finished"] is True and status.json()["records"] == 2
+    assert missing.status_code == 404
+    with db.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM conversion_history")).scalar() == 1
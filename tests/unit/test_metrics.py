@@ -0,0 +1,65 @@
+import threading
+
+from metrics import Registry
+
+
+def test_counter_sums_thread_shards():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.inc("b", amount=5)
+
+    assert counter.values() == {("a",): 4000, ("b",): 5}
+    assert 'jobs_total{kind="a"} 4000' in registry.render()
+
+
+def test_shards_of_finished_threads_are_folded():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs")
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(1.0,))
+
+    def work():
+        counter.inc()
+        histogram.observe(0.5)
+
+    for _ in range(200):
+        t = threading.Thread(target=work)
+        t.start()
+        t.join()
+
+    assert len(counter._shards) <= 1
+    assert len(histogram._shards) <= 1
+    assert counter.values() == {(): 200}
+    assert histogram.values()[()][-1] == 200
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "/x")
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/x",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/x"} 4' in lines
+    assert 'latency_seconds_sum{route="/x"} 4.05' in lines
+
+
+def test_gauge_reads_value_at_scrape_time():
+    registry = Registry()
+    depth = [3]
+    registry.gauge("queue_depth", "Depth", (), lambda: {(): depth[0]})
+    depth[0] = 7
+    assert "queue_depth 7" in registry.render()
@@ -0,0 +1,117 @@
+from datetime import date
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+import migrations
+
+
+def sqlite_engine():
+    return create_engine("sqlite://", poolclass=StaticPool)
+
+
+def test_migrate_fresh_database_creates_typed_table():
+    engine = sqlite_engine()
+
+    assert migrations.migrate(engine) == [1, 2, 3]
+
+    columns = {c["name"]: str(c["type"]) for c in inspect(engine).get_columns("conversion_history")}
+    assert columns["from_currency"] == "CHAR(3)"
+    assert columns["amount"] == "DECIMAL(24, 6)"
+    assert columns["date"] == "DATE"
+    assert "created_at" in columns
+    for column, (precision, scale) in migrations.HISTORY_DECIMALS.items():
+        assert columns[column] == f"DECIMAL({precision}, {scale})"
+    assert migrations.decimal_limit("rate") == 1e12
+    indexes = {i["name"] for i in inspect(engine).get_indexes("conversion_history")}
+    assert set(migrations.HISTORY_INDEXES) <= indexes
+
+
+def test_migrate_is_idempotent():
+    engine = sqlite_engine()
+    migrations.migrate(engine)
+
+    assert migrations.migrate(engine) == []
+    with engine.connect() as conn:
+        assert migrations.applied_versions(conn) == {1, 2, 3}
+
+
+def test_migrate_converts_legacy_rows():
+    engine = sqlite_engine()
+    with engine.begin() as conn:
+        migrations.create_migrations_table(conn)
+        migrations.legacy_history(conn)
+        conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (1, 'legacy conversion_history')"))
+        conn.execute(text("""
+            INSERT INTO conversion_history (from_currency, to_currency, amount, rate, converted, date)
+            VALUES ('EUR', 'USD', 100.0, 1.1, 110.0, '2024-01-05'), ('USD', 'PLN', 5.0, 4.0, 20.0, '2024-01-08')
+        """))
+
+    assert migrations.migrate(engine) == [2, 3]
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT {migrations.HISTORY_COLUMNS} FROM conversion_history ORDER BY id")).all()
+    assert [row.id for row in rows] == [1, 2]
+    # raw SQLite values; MySQL returns Decimal / date for the same columns
+    assert rows[0].amount == 100
+    assert str(rows[0].date) == "2024-01-05"
+    assert str(rows[0].created_at) == "2024-01-05 00:00:00"
+
+    # new rows still get ids after the copied ones and a timestamp by default
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO conversion_history (from_currency, to_currency, amount, rate, converted, date)
+            VALUES ('GBP', 'JPY', 1.0, 190.0, 190.0, '2024-02-01')
+        """))
+        row = conn.execute(text("SELECT id, created_at FROM conversion_history WHERE from_currency = 'GBP'")).one()
+    assert row.id == 3
+    assert row.created_at is not None
+
+
+def test_history_filters_use_indexes_in_id_order():
+    engine = sqlite_engine()
+    migrations.migrate(engine)
+
+    def plan(where):
+        with engine.connect() as conn:
+            return " | ".join(row[-1] for row in conn.execute(text(
+                f"EXPLAIN QUERY PLAN SELECT * FROM conversion_history WHERE {where} AND id < 1000 "
+                "ORDER BY id DESC LIMIT 101")))
+
+    for where, index in [("from_currency = 'EUR' AND to_currency = 'USD'", "idx_history_pair"),
+                         ("from_currency = 'EUR'", "idx_history_from"),
+                         ("to_currency = 'USD'", "idx_history_to"),
+                         ("date = '2024-01-05'", "idx_history_date")]:
+        assert index in plan(where) and "TEMP B-TREE" not in plan(where), where
+    # a date range is not in id order across days; the matching rows are sorted
+    assert "TEMP B-TREE FOR ORDER BY" in plan("date >= '2024-01-01' AND date <= '2024-01-31'")
+
+
+def test_month_helpers():
+    assert migrations.month_start("2024-03-17 10:00:00") == date(2024, 3, 1)
+    assert migrations.next_month(date(2024, 12, 1)) == date(2025, 1, 1)
+    assert migrations.partition_name(date(2024, 3, 1)) == "p202403"
+
+
+def test_month_range_extends_past_current_month():
+    current = migrations.this_month()
+    months = migrations.month_range(current, 2)
+    assert months == [current, migrations.next_month(current), migrations.next_month(migrations.next_month(current))]
+
+
+def test_partition_clause():
+    clause = migrations.partition_clause([date(2024, 1, 1), date(2024, 2, 1)])
+
+    assert clause.startswith("PARTITION BY RANGE COLUMNS(created_at)")
+    assert "PARTITION p202401 VALUES LESS THAN ('2024-02-01')" in clause
+    assert "PARTITION p202402 VALUES LESS THAN ('2024-03-01')" in clause
+    assert clause.endswith("PARTITION p_future VALUES LESS THAN (MAXVALUE)\n)")
+
+
+def test_partition_management_is_a_no_op_outside_mysql():
+    engine = sqlite_engine()
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        assert migrations.partitions(conn) == []
+        assert migrations.add_partitions(conn) == []
+        assert migrations.drop_partitions(conn, "2030-01-01") == []
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from rate_cache import RateCache, next_publication
+
+
+def make_table(rate_date="2024-01-05"):
+    return {"base": "EUR", "date": rate_date, "rates": {"USD": 1.1}}
+
+
+def test_next_publication_skips_weekend():
+    # Friday's table stays valid until Monday's publication
+    expires = next_publication("2024-01-05")
+    assert datetime.fromtimestamp(expires, timezone.utc) == datetime(2024, 1, 8, 16, tzinfo=timezone.utc)
+
+
+def test_entry_expires_at_next_publication():
+    now = [datetime(2024, 1, 5, 17, tzinfo=timezone.utc).timestamp()]
+    calls = []
+    cache = RateCache(lambda base: calls.append(base) or make_table(), clock=lambda: now[0])
+
+    cache.get("eur")
+    cache.get("EUR")
+    assert calls == ["EUR"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    now[0] = datetime(2024, 1, 8, 16, 1, tzinfo=timezone.utc).timestamp()
+    cache.get("EUR")
+    assert calls == ["EUR", "EUR"]
+
+
+def test_min_ttl_when_publication_is_late():
+    now = [datetime(2024, 1, 9, 17, tzinfo=timezone.utc).timestamp()]
+    calls = []
+    # upstream still serves the 2024-01-05 table although Monday's is due
+    cache = RateCache(lambda base: calls.append(base) or make_table(), clock=lambda: now[0], min_ttl=60)
+
+    cache.get("EUR")
+    cache.get("EUR")
+    assert len(calls) == 1
+
+    now[0] += 61
+    cache.get("EUR")
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_are_coalesced():
+    calls = []
+
+    def slow_fetch(base):
+        calls.append(base)
+        time.sleep(0.05)
+        return make_table()
+
+    cache = RateCache(slow_fetch)
+    threads = [threading.Thread(target=cache.get, args=("EUR",)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["EUR"]
+    assert cache.misses == 1
+    assert cache.hits == 9
+
+
+def test_async_concurrent_misses_are_coalesced():
+    calls = []
+
+    async def slow_fetch(base):
+        calls.append(base)
+        await asyncio.sleep(0.05)
+        return make_table()
+
+    async def burst():
+        return await asyncio.gather(*[cache.aget("eur") for _ in range(10)])
+
+    cache = RateCache(None, slow_fetch)
+    entries = asyncio.run(burst())
+
+    assert calls == ["EUR"]
+    assert all(entry["rates"] == {"USD": 1.1} for entry in entries)
+    assert (cache.hits, cache.misses) == (9, 1)
+
+
+def test_upstream_failure_serves_last_table_as_stale():
+    now = [datetime(2024, 1, 8, 17, tzinfo=timezone.utc).timestamp()]
+    outcomes = [make_table(), RuntimeError("down")]
+
+    def fetch(base):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    cache = RateCache(fetch, clock=lambda: now[0])
+    assert cache.get("EUR")["stale"] is False
+
+    now[0] += 86400
+    entry = cache.get("EUR")
+    assert entry["stale"] is True
+    assert entry["date"] == "2024-01-05"
+    assert cache.stale_served == 1
+
+
+def test_upstream_failure_without_table_raises():
+    def fetch(base):
+        raise RuntimeError("down")
+
+    cache = RateCache(fetch)
+    with pytest.raises(RuntimeError):
+        cache.get("EUR")
+
+
+def test_grace_keeps_expired_entry_servable():
+    now = [datetime(2024, 1, 5, 17, tzinfo=timezone.utc).timestamp()]
+    calls = []
+    cache = RateCache(lambda base: calls.append(base) or make_table(), clock=lambda: now[0])
+    cache.get("EUR")
+    cache.grace = 600
+
+    now[0] = datetime(2024, 1, 8, 16, 5, tzinfo=timezone.utc).timestamp()
+    cache.get("EUR")
+    assert len(calls) == 1
+
+
+def test_least_recently_used_base_is_evicted():
+    calls = []
+    cache = RateCache(lambda base: calls.append(base) or dict(make_table(), base=base), max_entries=2)
+
+    cache.get("EUR")
+    cache.get("USD")
+    cache.get("EUR")  # USD is now the least recently used
+    cache.get("PLN")
+
+    assert list(cache.stats()["entries"]) == ["EUR", "PLN"]
+    cache.get("USD")
+    assert calls == ["EUR", "USD", "PLN", "USD"]
+
+
+def test_concurrent_misses_share_an_upstream_failure():
+    calls = []
+
+    def failing_fetch(base):
+        calls.append(base)
+        time.sleep(0.05)
+        raise ConnectionError("upstream down")
+
+    cache = RateCache(failing_fetch)
+    errors = []
+
+    def get():
+        try:
+            cache.get("EUR")
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # the waiters do not retry the upstream one after another
+    assert calls == ["EUR"]
+    assert len(errors) == 10
+    assert cache.stats()["coalesced"] == 9
+
+
+def test_self_fetched_entry_is_fresh_until_source_version_changes():
+    version = [0]
+    calls = []
+    cache = RateCache(lambda base: calls.append(base) or make_table(), version=lambda: version[0])
+
+    for _ in range(5):
+        cache.get("EUR")
+    assert (len(calls), cache.hits) == (1, 4)
+
+    version[0] = 1  # a newer table was published
+    cache.get("EUR")
+    cache.get("EUR")
+    assert len(calls) == 2
@@ -0,0 +1,30 @@
+import pytest
+
+from rate_engine import RateTable, UnsupportedPair
+
+
+TABLE = RateTable("EUR", "2024-01-02", {"USD": 1.25, "PLN": 5.0, "GBP": 0.8})
+
+
+def test_direct_and_inverse_rates():
+    assert TABLE.rate("EUR", "USD") == 1.25
+    assert TABLE.rate("USD", "EUR") == 0.8
+    assert TABLE.rate("PLN", "PLN") == 1.0
+
+
+def test_cross_rate_is_triangulated_through_base():
+    assert TABLE.rate("USD", "PLN") == pytest.approx(4.0)
+    assert TABLE.rate("GBP", "USD") == pytest.approx(1.5625)
+
+
+def test_vectorised_rates_match_scalar_lookup():
+    froms = ["USD", "GBP", "EUR", "USD"]
+    tos = ["PLN", "USD", "GBP", "PLN"]
+    assert TABLE.rates(froms, tos).tolist() == [TABLE.rate(f, t) for f, t in zip(froms, tos)]
+
+
+def test_unknown_currency():
+    with pytest.raises(UnsupportedPair):
+        TABLE.rate("EUR", "XXX")
+    with pytest.raises(UnsupportedPair):
+        TABLE.rates(["XXX"], ["EUR"])
@@ -0,0 +1,64 @@
+import asyncio
+
+from rate_cache import RateCache
+from rate_refresher import RateRefresher
+
+
+def table(rate_date):
+    return {"base": "EUR", "date": rate_date, "rates": {"USD": 1.1}}
+
+
+async def no_sleep(seconds):
+    pass
+
+
+def test_refresh_swaps_in_new_table_and_calls_hook():
+    cache = RateCache(None)
+    cache.store("EUR", table("2024-01-04"))
+    stored = []
+
+    async def fetch(base):
+        return table("2024-01-05")
+
+    async def on_refresh(data):
+        stored.append(data["date"])
+
+    refresher = RateRefresher(cache, "EUR", fetch, on_refresh=on_refresh, sleep=no_sleep)
+    assert asyncio.run(refresher.refresh())
+
+    assert cache.peek("EUR")["date"] == "2024-01-05"
+    assert stored == ["2024-01-05"]
+
+
+def test_refresh_retries_with_backoff():
+    cache = RateCache(None)
+    delays = []
+    outcomes = [RuntimeError("down"), RuntimeError("down"), table("2024-01-05")]
+
+    async def fetch(base):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    refresher = RateRefresher(cache, "EUR", fetch, retry_initial=2, sleep=sleep)
+    assert asyncio.run(refresher.refresh())
+    assert delays == [2, 4]
+
+
+def test_failed_refresh_keeps_last_table_as_stale():
+    cache = RateCache(None)
+    cache.store("EUR", table("2024-01-04"))
+
+    async def fetch(base):
+        raise RuntimeError("upstream down")
+
+    refresher = RateRefresher(cache, "EUR", fetch, attempts=3, sleep=no_sleep)
+    assert not asyncio.run(refresher.refresh())
+
+    entry = cache.peek("EUR")
+    assert entry["stale"] and entry["date"] == "2024-01-04"
+    assert refresher.stats()["failures"] == 1
@@ -0,0 +1,131 @@
+import multiprocessing
+import uuid
+
+import numpy as np
+import pytest
+
+from rate_cache import RateCache
+from rate_engine import RateTable
+from rate_segment import META_SIZE, RateSegment
+
+
+def make_table(rate_date="2024-01-05", usd=1.1):
+    return RateTable("EUR", rate_date, {"USD": usd, "PLN": 4.3})
+
+
+@pytest.fixture
+def name():
+    name = f"fx_test_{uuid.uuid4().hex[:8]}"
+    yield name
+    cleanup = RateSegment(name)
+    cleanup.close(unlink=True)
+
+
+def test_read_before_publish(name):
+    segment = RateSegment(name)
+    assert segment.read() == (None, 0)
+    assert segment.read_payload() is None
+    segment.close()
+
+
+def test_publish_and_read_from_second_handle(name):
+    leader, follower = RateSegment(name), RateSegment(name)
+    assert leader.publish(make_table()) == 1
+
+    table, version = follower.read()
+    assert version == 1
+    assert table.date == "2024-01-05"
+    assert table.rate("USD", "PLN") == pytest.approx(4.3 / 1.1)
+    payload = follower.read_payload()
+    assert payload["rates"] == pytest.approx({"USD": 1.1, "PLN": 4.3})
+    assert payload["table"] is table
+    leader.close()
+    follower.close()
+
+
+def test_matrix_is_a_view_of_the_segment(name):
+    leader, follower = RateSegment(name), RateSegment(name)
+    leader.publish(make_table())
+    table, _ = follower.read()
+    assert not table.matrix.flags.owndata
+    assert np.shares_memory(table.matrix, np.frombuffer(follower._shm.buf, dtype=np.uint8))
+    # lookups read the shared matrix, not a per-worker copy of it
+    n = len(table.currencies)
+    shared = np.ndarray((n, n), dtype=np.float64, buffer=leader._shm.buf,
+                        offset=leader._slot_offset(0) + META_SIZE)
+    shared[table.index["EUR"], table.index["USD"]] = 1.2
+    assert table.rate("EUR", "USD") == 1.2
+    del table, shared
+    leader.close()
+    follower.close()
+
+
+def test_new_publication_bumps_version_and_keeps_old_slot(name):
+    leader, follower = RateSegment(name), RateSegment(name)
+    leader.publish(make_table())
+    first, _ = follower.read()
+    assert leader.publish(make_table("2024-01-08", usd=1.2)) == 2
+
+    second, version = follower.read()
+    assert version == 2
+    assert second.date == "2024-01-08"
+    assert second.rate("EUR", "USD") == pytest.approx(1.2)
+    # readers still holding the previous table see it unchanged
+    assert first.rate("EUR", "USD") == pytest.approx(1.1)
+    assert follower.read()[0] is second  # cached per version
+    del first, second
+    leader.close()
+    follower.close()
+
+
+def test_too_many_currencies(name):
+    segment = RateSegment(name, max_currencies=2)
+    with pytest.raises(ValueError):
+        segment.publish(make_table())
+    segment.close()
+
+
+def hold_lock(name, locked, release):
+    segment = RateSegment(name)
+    locked.put(segment.try_lead())
+    release.wait()
+    segment.close()
+
+
+def test_only_one_process_leads(name):
+    ctx = multiprocessing.get_context("fork")
+    locked, release = ctx.Queue(), ctx.Event()
+    child = ctx.Process(target=hold_lock, args=(name, locked, release))
+    child.start()
+    try:
+        assert locked.get(timeout=5) is True
+        segment = RateSegment(name)
+        assert segment.try_lead() is False
+    finally:
+        release.set()
+        child.join(5)
+    assert segment.try_lead() is True
+    assert segment.stats()["leader"] is True
+    segment.close()
+
+
+def test_rate_cache_refetches_on_new_version(name):
+    leader, follower = RateSegment(name), RateSegment(name)
+    leader.publish(make_table())
+    fetches = []
+
+    def fetch(base):
+        fetches.append(base)
+        return follower.read_payload()
+
+    cache = RateCache(fetch, version=lambda: follower.version)
+    assert cache.get("EUR")["date"] == "2024-01-05"
+    assert cache.get("EUR")["table"] is follower.read()[0]
+    assert len(fetches) == 1
+
+    leader.publish(make_table("2024-01-08"))
+    assert cache.get("EUR")["date"] == "2024-01-08"
+    assert len(fetches) == 2
+    cache.clear()
+    leader.close()
+    follower.close()
@@ -0,0 +1,80 @@
+import math
+
+import pytest
+from sqlalchemy import create_engine
+
+import rate_store
+from rate_snapshot import Snapshot, fetch_series, write_snapshot
+
+
+SERIES = {
+    "2024-01-02": {"USD": 1.0956, "PLN": 4.3525},
+    "2024-01-03": {"USD": 1.0919, "PLN": 4.3695, "JPY": 155.5},
+    "2024-01-05": {"USD": 1.0921, "PLN": 4.3663},
+}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = tmp_path / "rates.fxsnap"
+    assert write_snapshot(path, SERIES) == 3
+    snapshot = Snapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def test_round_trip(snapshot):
+    assert snapshot.base == "EUR"
+    assert snapshot.currencies == ("JPY", "PLN", "USD")
+    assert [snapshot.day(i) for i in range(len(snapshot))] == sorted(SERIES)
+    assert snapshot.table(1) == SERIES["2024-01-03"]
+    # JPY is missing on the other days
+    assert snapshot.table(0) == SERIES["2024-01-02"]
+    assert math.isnan(snapshot.rates[0, snapshot.column["JPY"]])
+
+
+def test_columns_are_views_of_the_mapping(snapshot):
+    assert not snapshot.rates.flags.owndata
+    assert not snapshot.rates.flags.writeable
+
+
+def test_lookup_by_day_falls_back_to_previous_publication(snapshot):
+    assert snapshot.index_on("2024-01-03") == 1
+    assert snapshot.index_on("2024-01-04") == 1
+    assert snapshot.index_on("2024-01-31") == 2
+    assert snapshot.index_on("2023-12-29") is None
+
+
+def test_range(snapshot):
+    assert list(snapshot.index_range("2024-01-03", "2024-01-05")) == [1, 2]
+    assert list(snapshot.index_range("2024-01-03")) == [1, 2]
+    assert list(snapshot.index_range("2024-01-06", "2024-01-07")) == []
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not.fxsnap"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        Snapshot(path)
+
+
+def test_fetch_series_in_chunks():
+    calls = []
+
+    def fetch(start, end, base):
+        calls.append((start, end))
+        return {"rates": {start: {"USD": 1.1}}}
+
+    series = fetch_series("2024-01-01", "2024-01-10", fetch=fetch, chunk_days=4)
+
+    assert calls == [("2024-01-01", "2024-01-04"), ("2024-01-05", "2024-01-08"), ("2024-01-09", "2024-01-10")]
+    assert sorted(series) == ["2024-01-01", "2024-01-05", "2024-01-09"]
+
+
+def test_series_from_local_store():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        rate_store.create_rates_table(conn)
+        rate_store.save_rates(conn, SERIES)
+        assert rate_store.series(conn, "2024-01-03", "2024-01-05") == {
+            "2024-01-03": SERIES["2024-01-03"], "2024-01-05": SERIES["2024-01-05"]}
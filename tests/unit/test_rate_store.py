@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+import rate_store
+
+
+SERIES = {
+    "2024-01-04": {"USD": 1.25, "PLN": 5.0},
+    "2024-01-05": {"USD": 1.0, "PLN": 4.0},
+    "2024-01-08": {"USD": 2.0, "PLN": 4.0},
+}
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        rate_store.create_rates_table(conn)
+        rate_store.save_rates(conn, SERIES)
+    return engine
+
+
+def test_rates_on_falls_back_to_previous_business_day(engine):
+    with engine.connect() as conn:
+        table = rate_store.rates_on(conn, "2024-01-07")
+        assert rate_store.rates_on(conn, "2024-01-01") is None
+
+    assert table.date == "2024-01-05"
+    assert rate_store.quote(table, "USD", ["PLN", "EUR"]) == {
+        "base": "USD", "date": "2024-01-05", "rates": {"PLN": 4.0, "EUR": 1.0},
+    }
+
+
+def test_timeseries_cross_rates(engine):
+    with engine.connect() as conn:
+        series = rate_store.timeseries(conn, "2024-01-05", "2024-01-31", "USD", ["PLN", "EUR"])
+
+    assert series == {
+        "2024-01-05": {"PLN": 4.0, "EUR": 1.0},
+        "2024-01-08": {"PLN": 2.0, "EUR": 0.5},
+    }
+
+
+def test_save_rates_is_idempotent(engine):
+    with engine.begin() as conn:
+        rate_store.save_rates(conn, {"2024-01-08": {"USD": 3.0}})
+    with engine.connect() as conn:
+        assert rate_store.rates_on(conn, "2024-01-08").rate("EUR", "USD") == 3.0
+
+
+def test_update_fetches_only_missing_days(engine):
+    calls = []
+
+    def fake_fetch(start, end, base):
+        calls.append((start, base))
+        return {"rates": {}}
+
+    rate_store.update(engine, fetch=fake_fetch)
+
+    assert calls[0] == ("2024-01-09", "EUR")
+
+
+def test_backfill_in_chunks(engine):
+    calls = []
+
+    def fake_fetch(start, end, base):
+        calls.append((start, end))
+        return {"rates": {start: {"USD": 1.1}}}
+
+    count = rate_store.backfill(engine, "2023-01-01", "2023-03-01", fetch=fake_fetch, chunk_days=30)
+
+    assert calls == [("2023-01-01", "2023-01-30"), ("2023-01-31", "2023-03-01")]
+    assert count == 2
@@ -0,0 +1,73 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import migrations
+import retention
+
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO conversion_history (from_currency, to_currency, amount, rate, converted, date, created_at)
+            VALUES (:f, :t, 1.0, 1.1, 1.1, :d, :c)
+        """), [
+            {"f": "EUR", "t": "USD", "d": "2024-01-05", "c": "2024-01-05 10:00:00"},
+            {"f": "USD", "t": "PLN", "d": "2024-01-08", "c": "2024-01-08 10:00:00"},
+            {"f": "EUR", "t": "USD", "d": "2024-02-01", "c": "2024-02-01 10:00:00"},
+            {"f": "EUR", "t": "USD", "d": "2024-05-31", "c": "2024-05-31 10:00:00"},
+        ])
+    return engine
+
+
+def live_ids(engine):
+    with engine.connect() as conn:
+        return list(conn.execute(text("SELECT id FROM conversion_history ORDER BY id")).scalars())
+
+
+def test_archive_moves_old_rows_in_chunks(engine, tmp_path):
+    summary = retention.archive(engine, days=30, archive_dir=tmp_path, chunk_rows=2, now=NOW)
+
+    assert summary["rows"] == 3
+    assert summary["files"] == 2
+    assert live_ids(engine) == [4]
+    assert [p.name for p in retention.archive_files(tmp_path)] == [
+        "history-000000000001-000000000002.ndjson.gz",
+        "history-000000000003-000000000003.ndjson.gz",
+    ]
+    with gzip.open(retention.archive_files(tmp_path)[0], "rt") as f:
+        first = json.loads(f.readline())
+    assert first["from_currency"] == "EUR"
+    assert first["created_at"] == "2024-01-05 10:00:00"
+
+
+def test_archive_twice_is_a_no_op(engine, tmp_path):
+    retention.archive(engine, days=30, archive_dir=tmp_path, now=NOW)
+    summary = retention.archive(engine, days=30, archive_dir=tmp_path, now=NOW)
+
+    assert summary["rows"] == 0
+    assert len(retention.archive_files(tmp_path)) == 1
+
+
+def test_read_archives_applies_history_filters(engine, tmp_path):
+    retention.archive(engine, days=30, archive_dir=tmp_path, chunk_rows=1, now=NOW)
+
+    chunks = list(retention.read_archives(tmp_path, chunk_rows=10, from_currency="eur", date_to="2024-01-31"))
+    assert [[row["id"] for row in chunk] for chunk in chunks] == [[1]]
+
+    chunks = list(retention.read_archives(tmp_path, chunk_rows=2))
+    assert [[row["id"] for row in chunk] for chunk in chunks] == [[1, 2], [3]]
+
+
+def test_read_archives_without_directory(tmp_path):
+    assert list(retention.read_archives(tmp_path / "missing")) == []
@@ -0,0 +1,51 @@
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import serialise
+from serialise import FastJSONResponse, HistoryRow, history_rows
+
+
+ROW = {"id": 1, "from_currency": "EUR", "to_currency": "USD", "amount": Decimal("100.000000"),
+       "rate": Decimal("1.100000"), "converted": Decimal("110.000000"), "date": datetime.date(2024, 1, 5)}
+
+
+def test_history_row_renders_like_jsonable_encoder():
+    from fastapi.encoders import jsonable_encoder
+
+    body = json.loads(FastJSONResponse(history_rows([ROW])).body)
+
+    assert body == [dict(jsonable_encoder(ROW), created_at=None)]
+    assert body[0]["amount"] == 100.0 and body[0]["date"] == "2024-01-05"
+
+
+def test_history_rows_from_sqlalchemy_mappings():
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT 7 AS id, 'EUR' AS from_currency, 'PLN' AS to_currency, 1.0 AS amount, "
+            "4.3 AS rate, 4.3 AS converted, '2024-01-05' AS date, '2024-01-05 10:00:00' AS created_at"
+        )).mappings().all()
+
+    (row,) = history_rows(rows)
+
+    assert isinstance(row, HistoryRow)
+    assert row.id == 7 and row.created_at == "2024-01-05 10:00:00"
+    assert not hasattr(row, "__dict__")
+
+
+def test_history_row_rejects_unknown_columns():
+    with pytest.raises(TypeError):
+        history_rows([dict(ROW, extra=1)])
+
+
+def test_stdlib_fallback_matches_orjson():
+    # without orjson, dumps() is json.dumps with the same default hook
+    payload = {"rows": history_rows([ROW]), "when": datetime.datetime(2024, 1, 5, 10, 30)}
+    fast = json.loads(serialise.dumps(payload))
+    slow = json.loads(json.dumps(payload, default=serialise.default))
+
+    assert fast == slow
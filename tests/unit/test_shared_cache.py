@@ -0,0 +1,138 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from rate_cache import RateCache
+from shared_cache import MemoryBackend, SharedRates, backend_from_url
+
+
+NOW = datetime(2024, 1, 5, 17, tzinfo=timezone.utc).timestamp()
+
+
+def make_table(rate_date="2024-01-05"):
+    return {"base": "EUR", "date": rate_date, "rates": {"USD": 1.1}}
+
+
+class FakeClock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_memory_backend_expiry_and_add():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+
+    assert backend.add("lock", "a", 10) is True
+    assert backend.add("lock", "b", 10) is False
+    backend.delete("lock", "b")  # not the owner
+    assert backend.get("lock") == "a"
+
+    clock.now += 11
+    assert backend.get("lock") is None
+    assert backend.add("lock", "b", 10) is True
+
+
+def test_backend_from_url():
+    assert isinstance(backend_from_url("memory://"), MemoryBackend)
+    with pytest.raises(ValueError):
+        backend_from_url("ftp://cache")
+
+
+def test_replicas_share_one_upstream_fetch():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    calls = []
+
+    def upstream(base):
+        calls.append(base)
+        return make_table()
+
+    replicas = [SharedRates(backend, upstream, clock=clock, sleep=clock.sleep) for _ in range(3)]
+    caches = [RateCache(replica.fetch, clock=clock) for replica in replicas]
+
+    tables = [cache.get("EUR") for cache in caches]
+
+    assert calls == ["EUR"]
+    assert {table["date"] for table in tables} == {"2024-01-05"}
+    assert replicas[1].stats()["shared_hits"] == 1
+
+
+def test_shared_copy_expires_with_the_table():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    shared = SharedRates(backend, lambda base: make_table(), clock=clock, sleep=clock.sleep)
+
+    shared.fetch("EUR")
+    clock.now = datetime(2024, 1, 8, 16, 1, tzinfo=timezone.utc).timestamp()
+
+    assert backend.get(SharedRates.key("EUR")) is None
+
+
+def test_waits_for_the_replica_holding_the_lock():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    backend.add(SharedRates.key("EUR") + ":lock", "other-replica", 30)
+    calls = []
+
+    def sleep(seconds):
+        clock.sleep(seconds)
+        # the lock holder finishes its fetch while we wait
+        backend.set(SharedRates.key("EUR"), json.dumps(make_table()), 3600)
+
+    shared = SharedRates(backend, lambda base: calls.append(base), clock=clock, sleep=sleep)
+
+    assert shared.fetch("EUR")["date"] == "2024-01-05"
+    assert calls == []
+    assert shared.stats()["waits"] == 1
+
+
+def test_fetches_itself_when_lock_holder_is_too_slow():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    backend.add(SharedRates.key("EUR") + ":lock", "other-replica", 30)
+    shared = SharedRates(backend, lambda base: make_table(), lock_wait=1, clock=clock, sleep=clock.sleep)
+
+    assert shared.fetch("EUR")["date"] == "2024-01-05"
+    assert shared.stats()["upstream_fetches"] == 1
+    # the other replica's lock is left alone
+    assert backend.get(SharedRates.key("EUR") + ":lock") == "other-replica"
+
+
+def test_unreachable_backend_goes_upstream():
+    class Down:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError("redis down")
+            return fail
+
+    shared = SharedRates(Down(), lambda base: make_table())
+
+    assert shared.fetch("EUR")["date"] == "2024-01-05"
+    assert shared.stats()["errors"] == 3  # read, lock, write
+
+
+def test_afetch_uses_shared_copy():
+    backend = MemoryBackend()
+    calls = []
+
+    async def upstream(base):
+        calls.append(base)
+        return make_table()
+
+    first = SharedRates(backend, None, upstream)
+    second = SharedRates(backend, None, upstream)
+
+    async def run():
+        await first.afetch("EUR")
+        return await second.afetch("EUR")
+
+    assert asyncio.run(run())["rates"] == {"USD": 1.1}
+    assert calls == ["EUR"]
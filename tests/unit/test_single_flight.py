@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def run_threads(n, target):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def slow(key):
+        calls.append(key)
+        time.sleep(0.05)
+        return key.lower()
+
+    results, errors = run_threads(8, lambda: flight.do("EUR", slow, "EUR"))
+
+    assert calls == ["EUR"] and not errors
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {value for value, _ in results} == {"eur"}
+    assert flight.stats() == {"executions": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_error_is_shared_with_waiters():
+    flight = SingleFlight()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.05)
+        raise ConnectionError("upstream down")
+
+    results, errors = run_threads(5, lambda: flight.do("EUR", failing))
+
+    assert len(calls) == 1 and not results
+    assert len(errors) == 5 and all(isinstance(e, ConnectionError) for e in errors)
+
+
+def test_nothing_is_kept_after_the_call():
+    flight = SingleFlight()
+    assert flight.do("EUR", lambda: 1) == (1, False)
+    assert flight.do("EUR", lambda: 2) == (2, False)
+
+
+def test_async_calls_share_one_task_and_survive_cancellation():
+    flight = SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "table"
+
+    async def burst():
+        first = asyncio.ensure_future(flight.ado("EUR", slow))
+        await asyncio.sleep(0)
+        others = [asyncio.ensure_future(flight.ado("EUR", slow)) for _ in range(4)]
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await asyncio.gather(*others)
+
+    results = asyncio.run(burst())
+
+    assert calls == [1]
+    assert results == [("table", True)] * 4
+    assert flight.stats()["in_flight"] == 0
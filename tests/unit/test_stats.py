@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import stats
+
+
+ROWS = [
+    {"date": "2024-01-05", "from_currency": "EUR", "to_currency": "USD", "amount": 10.0, "rate": 1.1, "converted": 11.0},
+    {"date": "2024-01-05", "from_currency": "EUR", "to_currency": "USD", "amount": 20.0, "rate": 1.1, "converted": 22.0},
+    {"date": "2024-01-08", "from_currency": "USD", "to_currency": "PLN", "amount": 5.0, "rate": 4.0, "converted": 20.0},
+]
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE conversion_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, from_currency VARCHAR(3), to_currency VARCHAR(3),
+                amount FLOAT, rate FLOAT, converted FLOAT, date VARCHAR(20)
+            )
+        """))
+        stats.create_stats_table(conn)
+        yield conn
+
+
+def test_aggregate_columns_matches_aggregate():
+    columns = [[row[key] for row in ROWS] for key in ("date", "from_currency", "to_currency", "amount", "rate", "converted")]
+    assert stats.aggregate_columns(*columns) == stats.aggregate(ROWS)
+
+
+def test_aggregate_groups_by_day_and_pair():
+    deltas = stats.aggregate(ROWS)
+    assert len(deltas) == 2
+    assert deltas[0]["conversions"] == 2
+    assert deltas[0]["total_amount"] == 30.0
+
+
+def test_record_is_incremental(conn):
+    stats.record(conn, ROWS[:1])
+    stats.record(conn, ROWS[1:])
+
+    result = stats.query(conn, from_currency="EUR")
+    assert result == [{
+        "day": "2024-01-05", "from_currency": "EUR", "to_currency": "USD",
+        "conversions": 2, "total_amount": 30.0, "total_converted": 33.0, "avg_rate": 1.1,
+    }]
+
+
+def test_record_upserts_in_primary_key_order():
+    executed = []
+
+    class RecordingConn:
+        dialect = create_engine("sqlite://").dialect
+
+        def execute(self, statement, params):
+            executed.append(params)
+
+    stats.record(RecordingConn(), list(reversed(ROWS)))
+
+    assert [stats.primary_key(delta) for delta in executed[0]] == [
+        ("2024-01-05", "EUR", "USD"), ("2024-01-08", "USD", "PLN")]
+
+
+def test_rebuild_matches_incremental(conn):
+    conn.execute(text("""
+        INSERT INTO conversion_history (from_currency, to_currency, amount, rate, converted, date)
+        VALUES (:from_currency, :to_currency, :amount, :rate, :converted, :date)
+    """), ROWS)
+    stats.record(conn, ROWS[:1])  # stale partial summary
+
+    assert stats.rebuild(conn) == 2
+    rebuilt = stats.query(conn)
+
+    conn.execute(text("DELETE FROM conversion_stats"))
+    stats.record(conn, ROWS)
+    assert rebuilt == stats.query(conn)
+    assert [row["day"] for row in rebuilt] == ["2024-01-08", "2024-01-05"]
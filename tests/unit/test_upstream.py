@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from upstream import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, LatencyWindow, UpstreamClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def failing():
+    raise ConnectionError("upstream down")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    client = UpstreamClient(CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=FakeClock()))
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            client.call(failing)
+
+    assert client.breaker.state == OPEN
+    calls = []
+    with pytest.raises(CircuitOpen):
+        client.call(lambda: calls.append(1))
+    assert calls == []
+    assert client.breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    client = UpstreamClient(breaker)
+
+    with pytest.raises(ConnectionError):
+        client.call(failing)
+    client.call(lambda: "ok")
+    with pytest.raises(ConnectionError):
+        client.call(failing)
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 31
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # the trial is still in flight
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 62
+    client = UpstreamClient(breaker)
+    assert client.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_latency_window_percentile():
+    window = LatencyWindow(size=100)
+    assert window.percentile(95) is None
+    for i in range(1, 101):
+        window.add(i / 1000)
+    assert window.percentile(95) == pytest.approx(0.096)
+
+
+def test_hedge_delay_follows_p95():
+    client = UpstreamClient(hedge=True, default_delay=0.5, min_delay=0.05, min_samples=5)
+    assert client.hedge_delay() == 0.5
+    for _ in range(5):
+        client.latencies.add(0.2)
+    assert client.hedge_delay() == 0.2
+    for _ in range(100):
+        client.latencies.add(0.001)
+    assert client.hedge_delay() == 0.05
+
+
+def test_hedged_call_returns_the_faster_attempt():
+    client = UpstreamClient(hedge=True, default_delay=0.02)
+    first_call = threading.Event()
+
+    def slow_then_fast():
+        if not first_call.is_set():
+            first_call.set()
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    start = time.perf_counter()
+    assert client.call(slow_then_fast) == "fast"
+    assert time.perf_counter() - start < 0.4
+    assert (client.hedges, client.hedge_wins) == (1, 1)
+    client.close()
+
+
+def test_fast_answer_is_not_hedged():
+    client = UpstreamClient(hedge=True, default_delay=0.5)
+    assert client.call(lambda: "ok") == "ok"
+    assert client.hedges == 0
+    client.close()
+
+
+def test_async_hedged_call():
+    client = UpstreamClient(hedge=True, default_delay=0.02)
+    attempts = []
+
+    async def slow_then_fast():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    assert asyncio.run(client.acall(slow_then_fast)) == "fast"
+    assert client.hedge_wins == 1
+
+
+def test_async_breaker():
+    client = UpstreamClient(CircuitBreaker(failure_threshold=1))
+
+    async def down():
+        raise ConnectionError("upstream down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(client.acall(down))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(client.acall(down))